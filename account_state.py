@@ -0,0 +1,93 @@
+from alpaca.trading.requests import GetOrdersRequest
+import threading
+
+#Order status values after which an order is no longer open
+CLOSED_ORDER_STATUS = {"filled", "canceled", "expired", "rejected", "replaced", "done_for_day", "stopped", "suspended"}
+
+#Maximum number of orders Alpaca returns per request (the default is only 50)
+ORDERS_PAGE_SIZE = 500
+
+
+def status_value(status):
+    return getattr(status, "value", status)
+
+
+def fetch_open_orders(trading_client, page_size=ORDERS_PAGE_SIZE):
+    """All open orders of the account, paged backwards by submission time"""
+    orders = {}
+    until = None
+    while True:
+        page = trading_client.get_orders(GetOrdersRequest(status="open", limit=page_size, direction="desc", until=until))
+        new = [order for order in page if str(order.id) not in orders]
+        for order in new:
+            orders[str(order.id)] = order
+        if len(page) < page_size:
+            return list(orders.values())
+        if not new:
+            raise RuntimeError(f"Open orders could not be paged, more than {page_size} orders share one submission time")
+        until = min(order.submitted_at for order in page)
+
+
+class AccountState:
+    """Positions and open orders of one account, loaded once and kept as indexes
+
+    After loading, has_position / has_open_order are dict lookups. Orders that
+    are submitted during the run are added with record_order. The state can
+    also be kept fresh from Alpaca's trade updates stream with a TradeListener.
+    """
+
+    def __init__(self, trading_client):
+        self.trading_client = trading_client
+        self.lock = threading.Lock()
+        self.refresh()
+
+    @classmethod
+    def from_record(cls, record):
+        """State of a recorded run (see to_record), without a trading client"""
+        state = cls.__new__(cls)
+        state.trading_client = None
+        state.lock = threading.Lock()
+        state.positions = dict(record.get("positions", {}))
+        state.open_orders = {symbol: {"recorded": None} for symbol in record.get("open_orders", [])}
+        return state
+
+    def to_record(self):
+        with self.lock:
+            return {"positions": {symbol: str(qty) for symbol, qty in self.positions.items()},
+                    "open_orders": sorted(symbol for symbol, orders in self.open_orders.items() if orders)}
+
+    def refresh(self):
+        positions = self.trading_client.get_all_positions()
+        orders = fetch_open_orders(self.trading_client)
+        with self.lock:
+            self.positions = {position.symbol: position.qty for position in positions}
+            self.open_orders = {}
+            for order in orders:
+                self.open_orders.setdefault(order.symbol, {})[str(order.id)] = order
+
+    def has_position(self, symbol):
+        with self.lock:
+            return symbol in self.positions
+
+    def has_open_order(self, symbol):
+        with self.lock:
+            return bool(self.open_orders.get(symbol))
+
+    def record_order(self, order):
+        with self.lock:
+            if status_value(order.status) in CLOSED_ORDER_STATUS:
+                self.open_orders.get(order.symbol, {}).pop(str(order.id), None)
+            else:
+                self.open_orders.setdefault(order.symbol, {})[str(order.id)] = order
+
+    def apply_trade_update(self, data):
+        """Updates the indexes from one trade update event"""
+        order = data.order
+        self.record_order(order)
+        if data.position_qty is None:
+            return
+        with self.lock:
+            if float(data.position_qty) == 0:
+                self.positions.pop(order.symbol, None)
+            else:
+                self.positions[order.symbol] = data.position_qty
@@ -0,0 +1,158 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+#Handelstage pro Jahr für die Annualisierung
+PERIODS_PER_YEAR = 252
+
+METRICS = (
+    "total_return", "annual_return", "volatility", "max_drawdown", "max_drawdown_days",
+    "sharpe", "sortino", "beta", "alpha", "days",
+)
+
+
+def daily_returns(frame):
+    """Tägliche Renditen aller Spalten, Lücken werden nicht überbrückt"""
+    return frame.pct_change(fill_method=None)
+
+
+def cumulative_returns(frame):
+    """Kumulierte Rendite seit dem ersten Wert jeder Spalte"""
+    return frame / frame.bfill().iloc[0] - 1
+
+
+def rolling_volatility(returns, window=21, periods=PERIODS_PER_YEAR):
+    """Annualisierte rollierende Volatilität"""
+    return returns.rolling(window, min_periods=window).std() * np.sqrt(periods)
+
+
+def drawdown(frame):
+    """Abstand zum bisherigen Höchststand, 0 am Höchststand, negativ darunter"""
+    return frame / frame.cummax() - 1
+
+
+def max_drawdown_duration(frame):
+    """Längste Zeit in Tagen, die jede Spalte unter ihrem Höchststand lag
+
+    Eine noch nicht beendete Phase zählt bis zum letzten Tag.
+    """
+    at_peak = frame >= frame.cummax()
+    days = np.asarray(frame.index.values.astype("datetime64[D]").astype(np.int64), dtype=float)
+    peak_day = pd.DataFrame(np.where(at_peak, days[:, None], np.nan), index=frame.index, columns=frame.columns).ffill()
+    duration = (days[:, None] - peak_day).where(frame.notna())
+    return duration.max().fillna(0).astype(int)
+
+
+def alpha_beta(returns, benchmark_returns, risk_free=0.0, periods=PERIODS_PER_YEAR):
+    """Beta und annualisiertes Alpha aller Spalten gegen eine Benchmark
+
+    Jede Spalte nutzt nur die Tage, an denen sie und die Benchmark Renditen haben.
+    """
+    values = returns.to_numpy(dtype=float)
+    bench = np.broadcast_to(benchmark_returns.reindex(returns.index).to_numpy(dtype=float)[:, None], values.shape)
+    mask = ~np.isnan(values) & ~np.isnan(bench)
+    count = mask.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(mask, values, 0).sum(axis=0) / count
+        bench_mean = np.where(mask, bench, 0).sum(axis=0) / count
+        deviation = np.where(mask, bench - bench_mean, 0)
+        covariance = (np.where(mask, values - mean, 0) * deviation).sum(axis=0) / (count - 1)
+        variance = (deviation ** 2).sum(axis=0) / (count - 1)
+        beta = covariance / variance
+        rf = risk_free / periods
+        alpha = (mean - rf - beta * (bench_mean - rf)) * periods
+    return pd.Series(beta, index=returns.columns), pd.Series(alpha, index=returns.columns)
+
+
+def compute_metrics(frame, benchmark=None, risk_free=0.0, periods=PERIODS_PER_YEAR):
+    """Alle Kennzahlen aller Spalten von frame in einem Durchlauf
+
+    frame hat ein Datum als Index und je Konto (oder Strategie-Variante) eine
+    Spalte mit dem Portfoliowert. Mit einer Benchmark-Reihe werden nur deren
+    Handelstage benutzt, sonst zählen die Wochenenden der Konten als Tage ohne
+    Rendite. risk_free ist der jährliche risikofreie Zins.
+    Gibt einen DataFrame mit einer Zeile je Spalte und den Spalten METRICS zurück.
+    """
+    frame = frame.astype(float)
+    if benchmark is not None:
+        benchmark = benchmark.astype(float).dropna()
+        frame = frame.reindex(benchmark.index)
+    returns = daily_returns(frame)
+    excess = returns - risk_free / periods
+    days = returns.count()
+
+    first, last = frame.bfill().iloc[0], frame.ffill().iloc[-1]
+    total = last / first - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annual = (1 + total) ** (periods / days) - 1
+        downside = np.sqrt((excess.clip(upper=0) ** 2).mean())
+        metrics = pd.DataFrame({
+            "total_return": total,
+            "annual_return": annual,
+            "volatility": returns.std() * np.sqrt(periods),
+            "max_drawdown": drawdown(frame).min(),
+            "max_drawdown_days": max_drawdown_duration(frame),
+            "sharpe": excess.mean() / excess.std() * np.sqrt(periods),
+            "sortino": excess.mean() / downside * np.sqrt(periods),
+            "days": days,
+        })
+    if benchmark is not None:
+        metrics["beta"], metrics["alpha"] = alpha_beta(returns, daily_returns(benchmark), risk_free, periods)
+    else:
+        metrics["beta"], metrics["alpha"] = np.nan, np.nan
+    return metrics[list(METRICS)]
+
+
+def fingerprint(series):
+    """Kurzer Fingerabdruck einer Reihe, ändert sich mit neuen oder korrigierten Werten"""
+    values = series.dropna()
+    if values.empty:
+        return "leer"
+    return f"{len(values)}:{values.index[-1]}:{float(values.iloc[-1])!r}:{float(values.sum())!r}"
+
+
+class MetricsCache:
+    """Speichert Kennzahlen je (Konto, Benchmark, Zeitraum)
+
+    Ein Eintrag gilt nur, solange sich die Daten im Zeitraum nicht geändert
+    haben. Mit path werden die Einträge als Parquet-Datei gespeichert und in
+    späteren Läufen wiederverwendet.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.entries = {}
+        if self.path and self.path.exists():
+            stored = pd.read_parquet(self.path)
+            for row in stored.to_dict("records"):
+                key = (row.pop("account"), row.pop("benchmark"), row.pop("start"), row.pop("end"), row.pop("fingerprint"))
+                self.entries[key] = row
+
+    def key(self, account, benchmark_name, start, end, series, benchmark, risk_free):
+        data_key = "|".join([fingerprint(series), fingerprint(benchmark) if benchmark is not None else "", repr(risk_free)])
+        return account, benchmark_name or "", str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date()), data_key
+
+    def metrics(self, frame, start, end, benchmark=None, benchmark_name=None, risk_free=0.0):
+        """Kennzahlen aller Spalten von frame im Zeitraum, nur fehlende werden berechnet"""
+        window = frame.loc[(frame.index >= start) & (frame.index <= end)]
+        bench = None
+        if benchmark is not None:
+            bench = benchmark.loc[(benchmark.index >= start) & (benchmark.index <= end)]
+        keys = {column: self.key(column, benchmark_name, start, end, window[column], bench, risk_free) for column in window.columns}
+
+        missing = [column for column, key in keys.items() if key not in self.entries]
+        if missing:
+            computed = compute_metrics(window[missing], bench, risk_free=risk_free)
+            for column, row in computed.iterrows():
+                self.entries[keys[column]] = row.to_dict()
+            self.save()
+        table = pd.DataFrame({column: self.entries[key] for column, key in keys.items()}).T[list(METRICS)]
+        return table.astype(float).astype({"max_drawdown_days": int, "days": int})
+
+    def save(self):
+        if not self.path:
+            return
+        rows = [dict(zip(("account", "benchmark", "start", "end", "fingerprint"), key), **values)
+                for key, values in self.entries.items()]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(rows).to_parquet(self.path)
@@ -0,0 +1,248 @@
+from alpaca.data.requests import StockBarsRequest
+from alpaca.data.timeframe import TimeFrame
+from datetime import datetime, time
+from dotenv import load_dotenv
+import argparse
+import csv
+import os
+import numpy as np
+
+from insider_strategy import build_chat_prompt as build_insider_prompt, collect_insider_data
+from web_strategy import build_chat_prompt as build_web_prompt
+from prompt_compaction import DEFAULT_TOKEN_BUDGET, compact_insider_data, dumps
+from trade_parser import parse_instruction
+from run_record import RUN_RECORD_DIR, run_records_by_day
+from bracket_sim import AMBIGUITY_POLICIES, EXIT_REASONS, simulate_brackets
+
+#Bar sizes of the --timeframe option
+TIMEFRAMES = {"day": TimeFrame.Day, "hour": TimeFrame.Hour, "minute": TimeFrame.Minute}
+
+
+def load_bars(data_client, symbols, start, end, timeframe=TimeFrame.Day):
+    """Loads the bars of all symbols as NumPy arrays: symbol -> {"time", "open", "high", "low", "close", "volume"}"""
+    request = StockBarsRequest(symbol_or_symbols=list(symbols), timeframe=timeframe, start=start, end=end)
+    barset = data_client.get_stock_bars(request)
+    bars = {}
+    for symbol, rows in barset.data.items():
+        if not rows:
+            continue
+        bars[symbol] = {
+            "time": np.array([np.datetime64(bar.timestamp.replace(tzinfo=None), "s") for bar in rows]),
+            "open": np.array([bar.open for bar in rows], dtype=float),
+            "high": np.array([bar.high for bar in rows], dtype=float),
+            "low": np.array([bar.low for bar in rows], dtype=float),
+            "close": np.array([bar.close for bar in rows], dtype=float),
+            "volume": np.array([bar.volume for bar in rows], dtype=float),
+        }
+    return bars
+
+
+class InsiderReplay:
+    """Prompt of LLM_Insider.py with the Quiver data that was published up to as_of
+
+    The political beta only exists live, so it is empty in the backtest.
+    With a QuiverStore every day is a range query instead of a scan of the
+    full history.
+    """
+    name = "insider"
+
+    def __init__(self, quiver_get, token_budget=DEFAULT_TOKEN_BUDGET, json_output=False, store=None):
+        self.quiver_get = quiver_get
+        self.token_budget = token_budget
+        self.store = store
+        self.chat_prompt = build_insider_prompt(json_output=json_output)
+
+    def prepare(self, symbol, as_of, price):
+        all_data = collect_insider_data(self.quiver_get, symbol, as_of, [], store=self.store)
+        json_data = dumps(compact_insider_data(all_data, token_budget=self.token_budget))
+        return self.chat_prompt.format_messages(input_stock=symbol, json_data=json_data, current_stock_price=price)
+
+
+class WebReplay:
+    """Prompt of the live web run of the day as_of, looked up by symbol and date
+
+    The search model reads today's news and not the news of as_of, so the
+    web strategy is only replayed from cached answers of the live runs. The
+    prompt is rebuilt from the recorded runs (see run_record) with the date
+    and the price the live run used, days without a live run are skipped.
+    """
+    name = "web"
+
+    def __init__(self, records=None):
+        self.records = run_records_by_day() if records is None else records
+        self.chat_prompt = build_web_prompt()
+
+    def prepare(self, symbol, as_of, price):
+        for _, snapshot in self.records.get(as_of.date(), []):
+            if symbol in snapshot:
+                return self.chat_prompt.format_messages(input_stock=symbol, today=as_of.strftime("%Y-%m-%d"),
+                                                        current_stock_price=snapshot[symbol]["price"])
+        return None
+
+
+def resolve_bracket(bars, entry_index, side, stop, target, max_bars=None, ambiguity="stop_first"):
+    """Resolves one bracket order with the vectorized simulator, returns (exit_index, exit_price, reason)"""
+    result = simulate_brackets(
+        [entry_index], 1 if side == "buy" else -1, bars["open"][entry_index], stop, target,
+        bars["open"], bars["high"], bars["low"], bars["close"], max_bars=max_bars, ambiguity=ambiguity)
+    return int(result["exit_index"][0]), float(result["exit_price"][0]), EXIT_REASONS[int(result["reason"][0])]
+
+
+def run_backtest(strategy, bars, invoke, start=None, end=None, qty=15, max_bars=None, ambiguity="stop_first"):
+    """Replays the strategy day by day
+
+    After the close of every day each symbol without an open position is
+    analysed with the data known at that day and the close of its last bar
+    of the day. The bracket order is entered at the open of the next bar,
+    with intraday bars the first bar of the next session, and resolved on
+    the following bars.
+    invoke(messages) returns the answer of the model, e.g. from the LLMCache.
+    """
+    days = np.unique(np.concatenate([symbol_bars["time"].astype("datetime64[D]") for symbol_bars in bars.values()]))
+    if start is not None:
+        days = days[days >= np.datetime64(start, "D")]
+    if end is not None:
+        days = days[days <= np.datetime64(end, "D")]
+
+    trade_days = {symbol: symbol_bars["time"].astype("datetime64[D]") for symbol, symbol_bars in bars.items()}
+    busy_until = {}
+    trades = []
+
+    for day in days:
+        as_of = datetime.combine(day.astype(datetime), time(16, 0))
+        for symbol, symbol_bars in bars.items():
+            #last bar of the day, the decision is made after the close and must not see later bars
+            index = int(np.searchsorted(trade_days[symbol], day, side="right")) - 1
+            if index < 0 or index >= len(trade_days[symbol]) - 1 or trade_days[symbol][index] != day:
+                continue #no bar today or no bar to enter tomorrow
+            if index < busy_until.get(symbol, -1):
+                continue #position still open
+
+            price = float(symbol_bars["close"][index])
+            messages = strategy.prepare(symbol, as_of, price)
+            if messages is None:
+                continue
+            try:
+                content = invoke(messages)
+            except LookupError:
+                continue #no cached answer in replay mode
+            instruction = parse_instruction(content)
+            if not instruction.is_valid:
+                continue
+
+            entry_index = index + 1
+            entry_price = float(symbol_bars["open"][entry_index])
+            side = instruction.side
+            stop, target = instruction.stop_loss, instruction.take_profit
+            #Alpaca rejects brackets with levels on the wrong side of the entry
+            if side == "buy" and not stop < entry_price < target:
+                continue
+            if side == "sell" and not target < entry_price < stop:
+                continue
+
+            exit_index, exit_price, reason = resolve_bracket(symbol_bars, entry_index, side, stop, target, max_bars, ambiguity)
+            direction = 1 if side == "buy" else -1
+            trades.append({
+                "symbol": symbol,
+                "side": side,
+                "decision_date": str(day),
+                "entry_time": str(symbol_bars["time"][entry_index]),
+                "entry_price": entry_price,
+                "take_profit": target,
+                "stop_loss": stop,
+                "exit_time": str(symbol_bars["time"][exit_index]),
+                "exit_price": exit_price,
+                "exit_reason": reason,
+                "qty": qty,
+                "pnl": round((exit_price - entry_price) * qty * direction, 2),
+            })
+            busy_until[symbol] = exit_index
+    return trades
+
+
+def summarize_trades(trades):
+    pnl = np.array([trade["pnl"] for trade in trades], dtype=float)
+    return {
+        "trades": len(trades),
+        "win_rate": float((pnl > 0).mean()) if len(pnl) else 0.0,
+        "total_pnl": float(pnl.sum()),
+        "average_pnl": float(pnl.mean()) if len(pnl) else 0.0,
+        "take_profit_exits": sum(1 for trade in trades if trade["exit_reason"] == "take_profit"),
+        "stop_loss_exits": sum(1 for trade in trades if trade["exit_reason"] == "stop_loss"),
+    }
+
+
+def write_trades(trades, path):
+    if not trades:
+        return
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(trades[0]))
+        writer.writeheader()
+        writer.writerows(trades)
+
+
+def main():
+    from alpaca.data.historical import StockHistoricalDataClient
+    from langchain_openai import ChatOpenAI
+    from llm_cache import LLMCache
+    from quiver_cache import QuiverCache
+    from quiver_client import QuiverClient
+    from quiver_store import QuiverStore
+
+    parser = argparse.ArgumentParser(description="Replays the insider or web strategy over historical data")
+    parser.add_argument("--strategy", choices=["insider", "web"], default="insider")
+    parser.add_argument("--symbols", default="NVDA,LLY,JPM,PG,XOM,UNP,META,LMT,TSLA,WMT")
+    parser.add_argument("--start", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--qty", type=int, default=15)
+    parser.add_argument("--timeframe", choices=sorted(TIMEFRAMES), default="day",
+                        help="bars the brackets are resolved on, decisions are made once per day")
+    parser.add_argument("--max-bars", type=int, default=None, help="close unresolved brackets after this many bars")
+    parser.add_argument("--ambiguity", choices=AMBIGUITY_POLICIES, default="stop_first",
+                        help="fill of bars that touch stop and target")
+    parser.add_argument("--replay", action="store_true", help="use only cached answers of the model")
+    parser.add_argument("--output", default="backtest_trades.csv")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.strategy == "insider":
+        openai_key, alpaca_key, alpaca_secret = "OPENAI_API_INSIDE_KEY", "ALPACA_API_INSIDE_KEY", "ALPACA_SECRET_INSIDE_KEY"
+        model = "gpt-4.1"
+    else:
+        openai_key, alpaca_key, alpaca_secret = "OPENAI_API_WEB_KEY", "ALPACA_API_WEB_KEY", "ALPACA_SECRECT_WEB_KEY"
+        model = "gpt-4o-search-preview"
+
+    data_client = StockHistoricalDataClient(os.getenv(alpaca_key), os.getenv(alpaca_secret))
+    chat_model = ChatOpenAI(model=model, openai_api_key=os.getenv(openai_key))
+    #The web search model never gets a past date, only answers of the live runs are replayed
+    llm_cache = LLMCache(db_path=os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite"), replay=args.replay or args.strategy == "web")
+
+    if args.strategy == "insider":
+        quiver_client = QuiverClient({'Accept': "application/json", 'Authorization': os.getenv("QUIVER_API_KEY", "XXXXX")})
+        quiver_cache = QuiverCache(
+            db_path=os.getenv("QUIVER_CACHE_PATH", "quiver_cache.sqlite"),
+            fixtures_dir=os.getenv("QUIVER_FIXTURES_DIR"),
+            offline=os.getenv("QUIVER_OFFLINE") == "1")
+        quiver_get = lambda path: quiver_cache.get_json(path, quiver_client.request)
+        quiver_store = QuiverStore(
+            db_path=os.getenv("QUIVER_STORE_PATH", "quiver_store.sqlite"),
+            fetch=quiver_client.request,
+            offline=os.getenv("QUIVER_OFFLINE") == "1",
+            fallback_get=quiver_get)
+        strategy = InsiderReplay(quiver_get, store=quiver_store)
+    else:
+        strategy = WebReplay(run_records_by_day(os.getenv("RUN_RECORD_DIR", RUN_RECORD_DIR)))
+
+    symbols = [symbol.strip() for symbol in args.symbols.split(",") if symbol.strip()]
+    start, end = datetime.fromisoformat(args.start), datetime.fromisoformat(args.end)
+    bars = load_bars(data_client, symbols, start, end, TIMEFRAMES[args.timeframe])
+
+    trades = run_backtest(strategy, bars, lambda messages: llm_cache.invoke(chat_model, messages),
+                          qty=args.qty, max_bars=args.max_bars, ambiguity=args.ambiguity)
+    write_trades(trades, args.output)
+    for key, value in summarize_trades(trades).items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import numpy as np
+
+#Exit reasons in the result arrays
+OPEN, TAKE_PROFIT, STOP_LOSS = 0, 1, 2
+EXIT_REASONS = {OPEN: "open", TAKE_PROFIT: "take_profit", STOP_LOSS: "stop_loss"}
+
+#Policies for bars that touch the stop and the target at the same time
+AMBIGUITY_POLICIES = ("stop_first", "target_first", "nearest_to_open")
+
+#Maximum number of trade-bar pairs that are held in memory at once
+MAX_CELLS = 4_000_000
+
+
+def as_2d(array):
+    array = np.asarray(array, dtype=float)
+    return array[None, :] if array.ndim == 1 else array
+
+
+def simulate_brackets(entry_index, side, entry_price, stop, target, open_, high, low, close,
+                      series=None, time=None, qty=1, max_bars=None, ambiguity="stop_first"):
+    """Resolves many bracket orders at once on OHLC bar arrays
+
+    The bars are 1D arrays of one symbol or 2D arrays (symbols x bars, padded
+    with NaN at the end), series is the row of every trade. side is +1 for
+    long and -1 for short. Every trade is entered at entry_price on the bar
+    entry_index and exits at the first bar that touches the stop or the target.
+    A bar that opens beyond a level fills at its open. Trades that are not
+    resolved within max_bars (or the data) exit at the last close.
+
+    time is one array shared by all series or a 2D array like the bars.
+    Returns a dict of arrays: exit_index, exit_price, exit_time (if time is
+    given), reason (OPEN / TAKE_PROFIT / STOP_LOSS), pnl and return.
+    """
+    if ambiguity not in AMBIGUITY_POLICIES:
+        raise ValueError(f"Unknown ambiguity policy {ambiguity}, use one of {AMBIGUITY_POLICIES}")
+
+    open_, high, low, close = as_2d(open_), as_2d(high), as_2d(low), as_2d(close)
+    entry_index = np.asarray(entry_index, dtype=np.int64)
+    trades = len(entry_index)
+    side = np.broadcast_to(np.asarray(side, dtype=float), (trades,))
+    entry_price = np.broadcast_to(np.asarray(entry_price, dtype=float), (trades,))
+    stop = np.broadcast_to(np.asarray(stop, dtype=float), (trades,))
+    target = np.broadcast_to(np.asarray(target, dtype=float), (trades,))
+    series = np.zeros(trades, dtype=np.int64) if series is None else np.asarray(series, dtype=np.int64)
+
+    bars = close.shape[1]
+    valid_bars = (~np.isnan(close)).sum(axis=1) #bars per series without padding
+    end = valid_bars[series]
+    window = bars if max_bars is None else int(max_bars)
+    if max_bars is not None:
+        end = np.minimum(end, entry_index + window)
+    window = max(1, min(window, bars - int(entry_index.min()) if trades else 1))
+
+    exit_index = np.empty(trades, dtype=np.int64)
+    exit_price = np.empty(trades, dtype=float)
+    reason = np.empty(trades, dtype=np.int8)
+
+    chunk = max(1, MAX_CELLS // window)
+    offsets = np.arange(window)
+    for first in range(0, trades, chunk):
+        part = slice(first, first + chunk)
+        rows = series[part][:, None]
+        index = entry_index[part][:, None] + offsets
+        valid = index < end[part][:, None]
+        index = np.minimum(index, bars - 1)
+
+        bar_open, bar_high, bar_low = open_[rows, index], high[rows, index], low[rows, index]
+        is_long = side[part][:, None] > 0
+        trade_stop, trade_target = stop[part][:, None], target[part][:, None]
+
+        stop_hit = np.where(is_long, bar_low <= trade_stop, bar_high >= trade_stop) & valid
+        target_hit = np.where(is_long, bar_high >= trade_target, bar_low <= trade_target) & valid
+        first_stop = np.where(stop_hit.any(axis=1), stop_hit.argmax(axis=1), window)
+        first_target = np.where(target_hit.any(axis=1), target_hit.argmax(axis=1), window)
+
+        same_bar = (first_stop == first_target) & (first_stop < window)
+        if ambiguity == "stop_first":
+            target_wins = first_target < first_stop
+        elif ambiguity == "target_first":
+            target_wins = (first_target < first_stop) | same_bar
+        else:
+            #the level closer to the open of the bar is assumed to be reached first
+            at = np.minimum(first_stop, window - 1)
+            opening = bar_open[np.arange(len(at)), at]
+            nearer_target = np.abs(opening - target[part]) < np.abs(opening - stop[part])
+            target_wins = (first_target < first_stop) | (same_bar & nearer_target)
+
+        hit_offset = np.where(target_wins, first_target, first_stop)
+        resolved = hit_offset < window
+        hit_bar_open = bar_open[np.arange(len(hit_offset)), np.minimum(hit_offset, window - 1)]
+        long_trade = side[part] > 0
+        stop_fill = np.where(long_trade, np.minimum(hit_bar_open, stop[part]), np.maximum(hit_bar_open, stop[part]))
+        target_fill = np.where(long_trade, np.maximum(hit_bar_open, target[part]), np.minimum(hit_bar_open, target[part]))
+
+        last_bar = np.maximum(end[part] - 1, entry_index[part])
+        exit_index[part] = np.where(resolved, entry_index[part] + hit_offset, last_bar)
+        exit_price[part] = np.where(resolved, np.where(target_wins, target_fill, stop_fill), close[series[part], last_bar])
+        reason[part] = np.where(resolved, np.where(target_wins, TAKE_PROFIT, STOP_LOSS), OPEN)
+
+    pnl = (exit_price - entry_price) * side * qty
+    result = {
+        "exit_index": exit_index,
+        "exit_price": exit_price,
+        "reason": reason,
+        "pnl": pnl,
+        "return": (exit_price / entry_price - 1) * side,
+    }
+    if time is not None:
+        time = np.asarray(time)
+        result["exit_time"] = time[exit_index] if time.ndim == 1 else time[series, exit_index]
+    return result
+
+
+def resolve_one(entry_index, side, stop, target, open_, high, low, close, end, ambiguity="stop_first"):
+    """Resolves one bracket order bar by bar, the reference for simulate_brackets"""
+    for i in range(entry_index, end):
+        if side > 0:
+            stop_hit, target_hit = low[i] <= stop, high[i] >= target
+        else:
+            stop_hit, target_hit = high[i] >= stop, low[i] <= target
+        if not (stop_hit or target_hit):
+            continue
+        if stop_hit and target_hit:
+            if ambiguity == "nearest_to_open":
+                target_hit = abs(open_[i] - target) < abs(open_[i] - stop)
+            else:
+                target_hit = ambiguity == "target_first"
+        if target_hit:
+            price = max(open_[i], target) if side > 0 else min(open_[i], target)
+            return i, price, TAKE_PROFIT
+        price = min(open_[i], stop) if side > 0 else max(open_[i], stop)
+        return i, price, STOP_LOSS
+    last = max(end - 1, entry_index)
+    return last, close[last], OPEN
+
+
+def self_check(trades=2000, symbols=5, bars=300, seed=0):
+    """Compares simulate_brackets with the bar by bar loop on random walks with padding and small chunks"""
+    global MAX_CELLS
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (symbols, bars)), axis=1))
+    open_ = close * np.exp(rng.normal(0, 0.01, close.shape))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, close.shape)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, close.shape)))
+    lengths = rng.integers(bars // 2, bars + 1, symbols)
+    for row, length in enumerate(lengths):
+        for array in (open_, high, low, close):
+            array[row, length:] = np.nan
+    time = np.arange(bars) * 86400
+
+    series = rng.integers(0, symbols, trades)
+    entry_index = rng.integers(0, lengths[series])
+    side = rng.choice([1, -1], trades)
+    entry_price = open_[series, entry_index]
+    stop = entry_price * (1 - side * rng.uniform(0.01, 0.1, trades))
+    target = entry_price * (1 + side * rng.uniform(0.01, 0.1, trades))
+
+    cells, MAX_CELLS = MAX_CELLS, 10_000
+    try:
+        for ambiguity in AMBIGUITY_POLICIES:
+            for max_bars in (None, 20):
+                result = simulate_brackets(entry_index, side, entry_price, stop, target, open_, high, low, close,
+                                           series=series, time=time, max_bars=max_bars, ambiguity=ambiguity)
+                for n in range(trades):
+                    row = series[n]
+                    end = lengths[row] if max_bars is None else min(lengths[row], entry_index[n] + max_bars)
+                    expected = resolve_one(entry_index[n], side[n], stop[n], target[n],
+                                           open_[row], high[row], low[row], close[row], end, ambiguity)
+                    actual = (result["exit_index"][n], result["exit_price"][n], result["reason"][n])
+                    assert actual[0] == expected[0] and actual[2] == expected[2] and np.isclose(actual[1], expected[1]), \
+                        f"trade {n} ({ambiguity}, max_bars {max_bars}): {actual} != {expected}"
+                assert (result["exit_time"] == time[result["exit_index"]]).all()
+    finally:
+        MAX_CELLS = cells
+    print(f"simulate_brackets matches the bar by bar loop for {trades} trades")
+
+
+if __name__ == "__main__":
+    self_check()
@@ -0,0 +1,94 @@
+from langchain.prompts import ChatPromptTemplate
+from dateutil.relativedelta import relativedelta
+from datetime import timedelta
+from trade_parser import JSON_OUTPUT_FORMAT
+
+#template used for different stocks
+system_template = """ 
+You are an experienced institutional-level equity trader with deep knowledge of macroeconomics, technical analysis, and risk management. 
+Your task is to analyze market data and identify high-probability, risk-adjusted trading opportunities across global equity markets.
+All recommendations should include a clear rationale, expected time horizon, and risk metrics such as stop-loss, risk-reward ratio, and volatility exposure
+"""
+
+human_template = """
+You are a professional equity trader specialized in short-term trading strategies (1-5 days holding period) with expertise in technical analysis, sentiment reading, and market microstructure. 
+
+You are given the following:
+- Stock symbol: {input_stock}
+- Current stock price: {current_stock_price}
+- Supplemental data in JSON format: {json_data}
+
+Your task:
+1. Analyze the provided JSON data in conjunction with the current market price.
+2. Decide whether a **long** or **short** position is optimal for achieving **short-term capital gains within a 5-day horizon**.
+3. Your analysis must be grounded in:
+   - Technical patterns and momentum (if available in the data),
+   - Short-term macro signals or earnings surprises,
+   - Relative volume or volatility shifts (if derivable),
+   - Risk-adjusted return estimates (based on stop-loss and take-profit logic).
+
+Trade Instruction Output Format (strict):
+
+Stock name: <Stock name>
+Buy/Sell price: $<Buy/Sell price>
+Take profit: $<Take profit>
+Stop loss: $<Stop loss>
+Explanation. <Short explanation in 2-3 sentences>"""
+
+#Endpoints that are fetched per symbol, with the field that holds the date of a row
+#and the field with the date on which the row was published
+SYMBOL_ENDPOINTS = {
+    "live_insider_trades": ("/beta/live/insiders?ticker=", "Date", "fileDate"),
+    "historical_congress_trades": ("/beta/historical/congresstrading/", "TransactionDate", "ReportDate"),
+    "historical_senate_trades": ("/beta/historical/senatetrading/", "Date", "ReportDate"),
+    "historical_house_trades": ("/beta/historical/housetrading/", "Date", "ReportDate"),
+}
+GOV_CONTRACTS_ENDPOINT = "/beta/historical/govcontracts/"
+
+
+def build_chat_prompt(json_output=False):
+    """The template is used to create a prompt for the model"""
+    template = human_template
+    if json_output:
+        template = template.split("Trade Instruction Output Format")[0] + JSON_OUTPUT_FORMAT
+    return ChatPromptTemplate.from_messages([
+        ("system", system_template),
+        ("human", template)])
+
+
+def collect_insider_data(quiver_get, symbol, as_of, political_beta_rows, months=2, contracts_after_year=2024, store=None):
+    """Collects the Quiver data of one symbol that was known at as_of
+
+    Trades of the last two months are kept, rows published after as_of are
+    left out, so the same function serves the live run and the backtest.
+    With a QuiverStore the windows are range queries on the ingested rows,
+    otherwise the full responses of quiver_get are filtered.
+    """
+    start = (as_of - relativedelta(months=months)).strftime("%Y-%m-%d")
+    end = (as_of + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    all_data = {"symbol": symbol}
+    for name, (path, date_field, published_field) in SYMBOL_ENDPOINTS.items():
+        if store is not None:
+            all_data[name] = store.trades(path, symbol, date_field, published_field, start, end, published_before=end)
+            continue
+        data = quiver_get(path + symbol)
+        all_data[name] = [
+            item for item in data
+            if start < item[date_field] < end and (item.get(published_field) or item[date_field]) < end
+        ]
+
+    #TODAY POLITCIAL BETA
+    all_data["today_political_beta"] = political_beta_rows
+
+    #HISTORICAL GOV CONTRACTS
+    quarter = (as_of.month - 1) // 3 + 1
+    if store is not None:
+        all_data["historical_gov_contracts"] = store.contracts(GOV_CONTRACTS_ENDPOINT, symbol, contracts_after_year, as_of.year, quarter)
+        return all_data
+    data = quiver_get(GOV_CONTRACTS_ENDPOINT + symbol)
+    all_data["historical_gov_contracts"] = [
+        item for item in data
+        if item["Qtr"] >= 1 and item["Year"] > contracts_after_year and (item["Year"], item["Qtr"]) <= (as_of.year, quarter)
+    ]
+    return all_data
@@ -0,0 +1,186 @@
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+import uuid
+import numpy as np
+
+#Estimated USD per 1M tokens (prompt, completion), LLM_PRICES (JSON) overrides or adds models
+MODEL_PRICES = {
+    "gpt-4.1": (2.0, 8.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-search-preview": (2.5, 10.0),
+}
+
+#The Batch API is billed at half the price
+BATCH_DISCOUNT = 0.5
+
+#Prefix of all Prometheus metric names
+METRIC_PREFIX = "llm_trading"
+
+
+def token_usage(message):
+    """(prompt_tokens, completion_tokens) of a langchain answer or an OpenAI usage dict, None if unknown"""
+    if isinstance(message, dict):
+        usage = message
+    else:
+        usage = getattr(message, "usage_metadata", None)
+        if not usage:
+            usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+    if not usage:
+        return None
+    prompt = usage.get("input_tokens", usage.get("prompt_tokens"))
+    completion = usage.get("output_tokens", usage.get("completion_tokens"))
+    if prompt is None and completion is None:
+        return None
+    return int(prompt or 0), int(completion or 0)
+
+
+def label_text(labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}" if labels else ""
+
+
+class Instrumentation:
+    """Timing spans, counters and LLM token costs of one process
+
+    span(stage, symbol=...) times a block, count(name, **labels) adds to a
+    counter and record_llm adds the tokens and the estimated cost of one
+    model call. Counters and span durations are kept in memory for the
+    summary table and the Prometheus file, every span and model call is also
+    appended as a JSON line to the run log (log_path None keeps no log).
+    Symbols only go into the run log and not into the counter labels.
+
+    A span costs two perf_counter calls, a dict update under a lock and one
+    line of the log, so it can stay on in production.
+    """
+
+    def __init__(self, log_path=None, run_id=None, prices=None):
+        self.run_id = run_id or f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+        self.prices = dict(MODEL_PRICES, **(prices or {}))
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.log = open(log_path, "a", encoding="utf-8", buffering=1) if log_path else None
+
+    def current_symbol(self):
+        stack = getattr(self.local, "symbols", None)
+        return stack[-1] if stack else None
+
+    def write(self, record):
+        if self.log is None:
+            return
+        line = json.dumps(dict(run=self.run_id, **record), default=str)
+        with self.lock:
+            self.log.write(line + "\n")
+
+    @contextmanager
+    def span(self, stage, symbol=None, **fields):
+        """Times the block, nested spans and model calls inherit the symbol"""
+        symbol = symbol or self.current_symbol()
+        stack = self.local.__dict__.setdefault("symbols", [])
+        stack.append(symbol)
+        wall = time.time()
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield fields
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            with self.lock:
+                self.durations.setdefault(stage, []).append(seconds)
+            if not ok:
+                self.count("errors_total", stage=stage)
+            self.write({"type": "span", "stage": stage, "symbol": symbol, "start": wall,
+                        "seconds": round(seconds, 6), "ok": ok, **fields})
+
+    def count(self, name, value=1, **labels):
+        #label values are strings, so the counters can be sorted for the summary (status 200 next to "error")
+        key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def cost(self, model, prompt_tokens, completion_tokens, batch=False):
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+        return cost * BATCH_DISCOUNT if batch else cost
+
+    def record_llm(self, model, usage, symbol=None, batch=False):
+        """Adds the tokens of one model call, usage is (prompt_tokens, completion_tokens) or None"""
+        symbol = symbol or self.current_symbol()
+        if usage is None:
+            self.count("llm_calls_total", model=model, usage="unknown")
+            self.write({"type": "llm", "model": model, "symbol": symbol, "batch": batch})
+            return
+        prompt_tokens, completion_tokens = usage
+        cost = self.cost(model, prompt_tokens, completion_tokens, batch)
+        self.count("llm_calls_total", model=model)
+        self.count("llm_prompt_tokens_total", prompt_tokens, model=model)
+        self.count("llm_completion_tokens_total", completion_tokens, model=model)
+        self.count("llm_cost_usd_total", cost, model=model)
+        self.write({"type": "llm", "model": model, "symbol": symbol, "batch": batch,
+                    "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "cost_usd": round(cost, 6)})
+
+    def stage_stats(self):
+        """stage -> (count, total, mean, p50, p95, max) in seconds, slowest total first"""
+        with self.lock:
+            durations = {stage: np.array(values) for stage, values in self.durations.items()}
+        stats = {}
+        for stage, values in durations.items():
+            p50, p95 = np.percentile(values, [50, 95])
+            stats[stage] = (len(values), values.sum(), values.mean(), p50, p95, values.max())
+        return dict(sorted(stats.items(), key=lambda item: -item[1][1]))
+
+    def summary(self):
+        """Table of the stages and the counters of the run"""
+        lines = [f"Run {self.run_id}: {time.perf_counter() - self.started:.1f}s",
+                 f"{'stage':<16}{'count':>7}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for stage, (count, total, mean, p50, p95, maximum) in self.stage_stats().items():
+            lines.append(f"{stage:<16}{count:>7}{total:>10.2f}{mean * 1000:>10.1f}"
+                         f"{p50 * 1000:>10.1f}{p95 * 1000:>10.1f}{maximum * 1000:>10.1f}")
+        with self.lock:
+            counters = sorted(self.counters.items())
+        if counters:
+            lines.append("")
+            for (name, labels), value in counters:
+                value = f"{value:.4f}" if isinstance(value, float) else f"{value}"
+                lines.append(f"{name}{label_text(labels)} {value}")
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """Counters and stage durations in the Prometheus text exposition format"""
+        lines = [f"# TYPE {METRIC_PREFIX}_stage_seconds summary"]
+        for stage, (count, total, _, p50, p95, _) in self.stage_stats().items():
+            for quantile, value in (("0.5", p50), ("0.95", p95)):
+                lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {count}')
+        with self.lock:
+            counters = sorted(self.counters.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+                typed.add(name)
+            lines.append(f"{METRIC_PREFIX}_{name}{label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        #Written to a temporary file first, so a node exporter never reads half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(self.prometheus())
+        os.replace(temporary, path)
+
+    def close(self):
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
@@ -0,0 +1,194 @@
+from pathlib import Path
+import json
+import time
+import uuid
+
+from instrumentation import token_usage
+
+#Roles of the langchain message types in the OpenAI chat format
+ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+#Batch status values after which polling stops
+FINAL_STATUS = {"completed", "failed", "expired", "cancelled"}
+
+
+def message_to_openai(message):
+    return {"role": ROLES.get(message.type, message.type), "content": message.content}
+
+
+def write_batch_file(prompts, path, model, temperature=None, model_kwargs=None):
+    """Writes one chat completion request per custom id into a JSONL batch file
+
+    prompts is a dict custom_id -> messages from chat_prompt.format_messages.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as file:
+        for custom_id, messages in prompts.items():
+            body = {"model": model, "messages": [message_to_openai(message) for message in messages]}
+            if temperature is not None:
+                body["temperature"] = temperature
+            body.update(model_kwargs or {})
+            request = {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}
+            file.write(json.dumps(request) + "\n")
+    return path
+
+
+def read_batch_output(text):
+    """Returns custom_id -> message content of a batch output file, None for failed requests"""
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            results[item["custom_id"]] = None
+            continue
+        results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results
+
+
+def read_batch_usage(text):
+    """Returns custom_id -> (prompt_tokens, completion_tokens) of the successful requests of a batch output file"""
+    usage = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if response.get("status_code") == 200:
+            usage[item["custom_id"]] = token_usage(response["body"].get("usage") or {})
+    return usage
+
+
+class OpenAIBatchBackend:
+    """Submits batch files to the OpenAI Batch API"""
+
+    def __init__(self, api_key):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key)
+
+    def submit(self, path):
+        with open(path, "rb") as file:
+            input_file = self.client.files.create(file=file, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h")
+        return batch.id
+
+    def retrieve(self, batch_id):
+        """Returns (status, output JSONL text or None)"""
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status != "completed" or not batch.output_file_id:
+            return batch.status, None
+        return batch.status, self.client.files.content(batch.output_file_id).text
+
+
+class LocalBatchBackend:
+    """Stub of the Batch API for tests, respond(messages) returns the answer of one request"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.batches = {}
+
+    def submit(self, path):
+        lines = []
+        for line in Path(path).read_text(encoding="utf-8").splitlines():
+            request = json.loads(line)
+            content = self.respond(request["body"]["messages"])
+            response = {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "response": response, "error": None}))
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        self.batches[batch_id] = "\n".join(lines)
+        return batch_id
+
+    def retrieve(self, batch_id):
+        return "completed", self.batches[batch_id]
+
+
+def run_batch(backend, prompts, model, temperature=None, batch_dir="batches", poll_interval=60, timeout=24 * 60 * 60,
+              cache=None, model_kwargs=None, instrumentation=None):
+    """Writes, submits and polls one batch, returns custom_id -> content
+
+    With an LLMCache only the prompts without a cached answer are submitted.
+    With an Instrumentation the tokens of every request are recorded at the batch price.
+    """
+    contents = {}
+    if cache is not None:
+        for custom_id, messages in prompts.items():
+            content = cache.get(model, temperature, messages)
+            if content is not None:
+                contents[custom_id] = content
+        if cache.replay:
+            return {custom_id: contents.get(custom_id) for custom_id in prompts}
+        prompts = {custom_id: messages for custom_id, messages in prompts.items() if custom_id not in contents}
+    if not prompts:
+        return contents
+    path = write_batch_file(prompts, Path(batch_dir) / f"batch_{datetime_stamp()}.jsonl", model, temperature, model_kwargs)
+    batch_id = backend.submit(path)
+    print(f"Batch {batch_id} with {len(prompts)} requests submitted. \n")
+
+    started = time.monotonic()
+    while True:
+        status, output = backend.retrieve(batch_id)
+        if status in FINAL_STATUS:
+            break
+        if time.monotonic() - started > timeout:
+            raise TimeoutError(f"Batch {batch_id} not finished after {timeout}s, last status {status}")
+        time.sleep(poll_interval)
+
+    if status != "completed":
+        raise RuntimeError(f"Batch {batch_id} ended with status {status}")
+    results = read_batch_output(output or "")
+    if instrumentation is not None:
+        for custom_id, usage in read_batch_usage(output or "").items():
+            instrumentation.record_llm(model, usage, symbol=custom_id, batch=True)
+    for custom_id, messages in prompts.items():
+        content = results.get(custom_id)
+        contents[custom_id] = content
+        if cache is not None and content is not None:
+            cache.put(model, temperature, messages, content)
+    return contents
+
+
+def datetime_stamp():
+    return time.strftime("%Y%m%d_%H%M%S")
+
+
+def self_check():
+    """Runs two batches through an LLMCache with the LocalBatchBackend"""
+    from types import SimpleNamespace
+    import tempfile
+    from llm_cache import LLMCache
+
+    def prompt(symbol):
+        return [SimpleNamespace(type="system", content="Answer with BUY, SELL or HOLD."),
+                SimpleNamespace(type="human", content=f"Stock: {symbol}")]
+
+    requests = []
+    def respond(messages):
+        requests.append(messages[-1]["content"])
+        return f"HOLD {messages[-1]['content']}"
+
+    backend = LocalBatchBackend(respond)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = LLMCache(Path(directory) / "llm_cache.sqlite")
+        try:
+            first = run_batch(backend, {"AAPL": prompt("AAPL"), "MSFT": prompt("MSFT")}, "gpt-4.1",
+                              batch_dir=directory, poll_interval=0, cache=cache)
+            assert first == {"AAPL": "HOLD Stock: AAPL", "MSFT": "HOLD Stock: MSFT"}
+            second = run_batch(backend, {"AAPL": prompt("AAPL"), "NVDA": prompt("NVDA")}, "gpt-4.1",
+                               batch_dir=directory, poll_interval=0, cache=cache)
+            assert second == {"AAPL": "HOLD Stock: AAPL", "NVDA": "HOLD Stock: NVDA"}
+            assert requests == ["Stock: AAPL", "Stock: MSFT", "Stock: NVDA"], requests
+            third = run_batch(backend, {"MSFT": prompt("MSFT")}, "gpt-4.1", batch_dir=directory, cache=cache)
+            assert third == {"MSFT": "HOLD Stock: MSFT"} and len(backend.batches) == 2
+        finally:
+            cache.close()
+    print("run_batch submitted only the prompts without a cached answer")
+
+
+if __name__ == "__main__":
+    self_check()
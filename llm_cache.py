@@ -0,0 +1,93 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from instrumentation import Instrumentation, token_usage
+
+
+def prompt_key(model, temperature, messages):
+    """Hash of model, temperature and the rendered messages"""
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [[message.type, message.content] for message in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite cache of model answers, keyed by a hash of model, temperature and rendered prompt
+
+    The least recently used entries are removed above max_entries, entries
+    older than max_age seconds are ignored. In replay mode nothing is written
+    and a missing answer raises LookupError instead of calling the model.
+    Hits, misses and the tokens of the model calls go to the instrumentation.
+    """
+
+    def __init__(self, db_path="llm_cache.sqlite", max_entries=10_000, max_age=None, replay=False, instrumentation=None):
+        self.instrumentation = instrumentation or Instrumentation()
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.replay = replay
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self.db.commit()
+
+    def get(self, model, temperature, messages):
+        key = prompt_key(model, temperature, messages)
+        with self.lock:
+            row = self.db.execute("SELECT content, created_at FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, created_at = row
+            if self.max_age is not None and time.time() - created_at > self.max_age and not self.replay:
+                return None
+            if not self.replay:
+                self.db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.db.commit()
+        return content
+
+    def put(self, model, temperature, messages, content):
+        if self.replay:
+            return
+        key = prompt_key(model, temperature, messages)
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)", (key, model, content, now, now))
+            #LRU eviction
+            self.db.execute(
+                "DELETE FROM answers WHERE key IN ("
+                " SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+            self.db.commit()
+
+    def invoke(self, chat_model, messages):
+        """Returns the cached answer or calls the model and stores its answer"""
+        model, temperature = chat_model.model_name, chat_model.temperature
+        content = self.get(model, temperature, messages)
+        if content is not None:
+            self.instrumentation.count("llm_cache_total", result="hit")
+            return content
+        self.instrumentation.count("llm_cache_total", result="miss")
+        if self.replay:
+            raise LookupError(f"No cached answer for this prompt in replay mode (model {model})")
+        answer = chat_model.invoke(messages)
+        self.instrumentation.record_llm(model, token_usage(answer))
+        content = answer.content
+        self.put(model, temperature, messages, content)
+        return content
+
+    def close(self):
+        with self.lock:
+            self.db.close()
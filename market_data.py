@@ -0,0 +1,64 @@
+from alpaca.data.requests import StockBarsRequest, StockLatestQuoteRequest, StockLatestTradeRequest
+from alpaca.data.timeframe import TimeFrame
+from datetime import datetime, timedelta
+import numpy as np
+
+#Maximum number of symbols per Alpaca request
+SYMBOLS_PER_REQUEST = 200
+
+
+def chunked(symbols, size):
+    for i in range(0, len(symbols), size):
+        yield symbols[i:i + size]
+
+
+def fetch_market_snapshot(data_client, symbols, chunk_size=SYMBOLS_PER_REQUEST, include_quotes=True):
+    """Fetches latest trade (and quote) of all symbols in batched requests
+
+    Returns a dict symbol -> {"price", "trade_time", "bid", "ask"}.
+    Symbols without a latest trade are missing in the result.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    snapshot = {}
+    for chunk in chunked(symbols, chunk_size):
+        trades = data_client.get_stock_latest_trade(StockLatestTradeRequest(symbol_or_symbols=chunk))
+        quotes = {}
+        if include_quotes:
+            quotes = data_client.get_stock_latest_quote(StockLatestQuoteRequest(symbol_or_symbols=chunk))
+        for symbol in chunk:
+            trade = trades.get(symbol)
+            if trade is None:
+                continue
+            quote = quotes.get(symbol)
+            snapshot[symbol] = {
+                "price": trade.price,
+                "trade_time": trade.timestamp,
+                "bid": quote.bid_price if quote is not None else None,
+                "ask": quote.ask_price if quote is not None else None,
+            }
+    return snapshot
+
+
+def fetch_daily_volatility(data_client, symbols, days=20, chunk_size=SYMBOLS_PER_REQUEST):
+    """Daily volatility (standard deviation of the log returns of the last days bars) of all symbols
+
+    Returns a dict symbol -> volatility, symbols with less than 3 bars are missing.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    start = datetime.now() - timedelta(days=days * 2 + 10) #calendar days that hold enough trading days
+    closes = {}
+    for chunk in chunked(symbols, chunk_size):
+        barset = data_client.get_stock_bars(StockBarsRequest(symbol_or_symbols=chunk, timeframe=TimeFrame.Day, start=start))
+        for symbol, bars in barset.data.items():
+            closes[symbol] = [bar.close for bar in bars][-(days + 1):]
+
+    names = [symbol for symbol in symbols if len(closes.get(symbol, [])) >= 3]
+    if not names:
+        return {}
+    #one padded array for all symbols, the returns are computed in one pass
+    matrix = np.full((len(names), days + 1), np.nan)
+    for row, symbol in enumerate(names):
+        values = closes[symbol]
+        matrix[row, -len(values):] = values
+    volatility = np.nanstd(np.diff(np.log(matrix), axis=1), axis=1, ddof=1)
+    return dict(zip(names, volatility.tolist()))
@@ -0,0 +1,227 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import json
+import threading
+import numpy as np
+
+from insider_strategy import SYMBOL_ENDPOINTS
+
+
+class BarWindow:
+    """Last size bars of one symbol in fixed NumPy ring buffers
+
+    Adding a bar is O(1) and never allocates, the statistics are computed on
+    the filled part of the buffers.
+    """
+
+    def __init__(self, size=60):
+        self.size = size
+        self.close = np.zeros(size)
+        self.volume = np.zeros(size)
+        self.turnover = np.zeros(size) #price times volume of every bar
+        self.position = 0
+        self.count = 0
+        self.last_time = None
+
+    def add(self, close, volume, vwap=None, timestamp=None):
+        self.close[self.position] = close
+        self.volume[self.position] = volume
+        self.turnover[self.position] = (vwap if vwap else close) * volume
+        self.position = (self.position + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.last_time = timestamp
+
+    def ordered(self, array):
+        """Filled part of a buffer, oldest bar first"""
+        if self.count < self.size:
+            return array[:self.count]
+        return np.roll(array, -self.position)
+
+    @property
+    def last_close(self):
+        return float(self.close[self.position - 1]) if self.count else None
+
+    @property
+    def last_volume(self):
+        return float(self.volume[self.position - 1]) if self.count else None
+
+    def vwap(self):
+        volume = self.volume[:self.count].sum()
+        return float(self.turnover[:self.count].sum() / volume) if volume else None
+
+    def volatility(self):
+        """Standard deviation of the log returns in the window"""
+        if self.count < 3:
+            return None
+        close = self.ordered(self.close)
+        return float(np.std(np.diff(np.log(close)), ddof=1))
+
+    def volume_ratio(self):
+        """Volume of the last bar relative to the mean volume of the bars before"""
+        if self.count < 2:
+            return None
+        volume = self.ordered(self.volume)
+        previous = volume[:-1].mean()
+        return float(volume[-1] / previous) if previous else None
+
+    def move(self):
+        """Last return in standard deviations of the window"""
+        volatility = self.volatility()
+        if not volatility:
+            return None
+        close = self.ordered(self.close)
+        return float(np.log(close[-1] / close[-2]) / volatility)
+
+
+class TriggerEngine:
+    """Calls on_trigger(symbol, reason, window) when a symbol just moved
+
+    Bars come from the StockDataStream (on_bar) or a recorded or synthetic
+    stream (replay). A trigger fires on a volume spike (last volume is
+    volume_spike times the mean of the window), on a price move of more than
+    move_sigma standard deviations and on a new insider filing (on_filing).
+    Every symbol fires at most once per cooldown, no rule fires before
+    min_bars bars were seen.
+    """
+
+    def __init__(self, symbols, on_trigger, window=60, volume_spike=3.0, move_sigma=3.0,
+                 min_bars=20, cooldown=timedelta(minutes=30)):
+        self.symbols = set(symbols)
+        self.on_trigger = on_trigger
+        self.volume_spike = volume_spike
+        self.move_sigma = move_sigma
+        self.min_bars = min_bars
+        self.cooldown = cooldown
+        self.windows = {symbol: BarWindow(window) for symbol in self.symbols}
+        self.last_trigger = {}
+        self.lock = threading.Lock()
+
+    def reasons(self, window):
+        if window.count < self.min_bars:
+            return []
+        reasons = []
+        ratio = window.volume_ratio()
+        if self.volume_spike and ratio is not None and ratio >= self.volume_spike:
+            reasons.append(f"volume spike x{ratio:.1f}")
+        move = window.move()
+        if self.move_sigma and move is not None and abs(move) >= self.move_sigma:
+            reasons.append(f"price move {move:+.1f} sigma")
+        return reasons
+
+    def fire(self, symbol, reasons, now):
+        with self.lock:
+            last = self.last_trigger.get(symbol)
+            if last is not None and now - last < self.cooldown:
+                return False
+            self.last_trigger[symbol] = now
+        self.on_trigger(symbol, ", ".join(reasons), self.windows.get(symbol))
+        return True
+
+    def add_bar(self, bar):
+        """Adds one bar and fires its triggers, returns True if a trigger fired"""
+        window = self.windows.get(bar.symbol)
+        if window is None:
+            return False
+        timestamp = bar.timestamp.replace(tzinfo=None)
+        window.add(float(bar.close), float(bar.volume), getattr(bar, "vwap", None), timestamp)
+        reasons = self.reasons(window)
+        return bool(reasons) and self.fire(bar.symbol, reasons, timestamp)
+
+    async def on_bar(self, bar):
+        self.add_bar(bar)
+
+    def on_filing(self, symbol, now=None):
+        #bar timestamps are UTC, the cooldown has to use the same clock
+        return self.fire(symbol, ["new insider filing"], now or datetime.now(timezone.utc).replace(tzinfo=None))
+
+    def replay(self, bars):
+        """Feeds a recorded or synthetic stream of bars, returns the number of triggers"""
+        return sum(1 for bar in bars if self.add_bar(bar))
+
+
+class FilingWatcher:
+    """Polls the live insider trades of the symbols and reports new filings
+
+    The first poll only remembers the filings that already exist. With a
+    QuiverCache, a new filing is seen at the latest after the cache TTL of
+    the insiders endpoint.
+    """
+
+    def __init__(self, quiver_get, symbols, on_filing):
+        self.quiver_get = quiver_get
+        self.symbols = list(symbols)
+        self.on_filing = on_filing
+        self.path = SYMBOL_ENDPOINTS["live_insider_trades"][0]
+        self.seen = {}
+
+    def filing_keys(self, rows):
+        return {json.dumps(row, sort_keys=True, default=str) for row in rows or []}
+
+    def poll(self):
+        new = []
+        for symbol in self.symbols:
+            try:
+                keys = self.filing_keys(self.quiver_get(self.path + symbol))
+            except Exception as e:
+                print(f"Insider filings of {symbol} failed: {e} \n")
+                continue
+            if symbol in self.seen and keys - self.seen[symbol]:
+                new.append(symbol)
+                self.on_filing(symbol)
+            self.seen[symbol] = keys
+        return new
+
+    def run(self, interval=900, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.poll()
+            stop_event.wait(interval)
+
+    def start(self, interval=900):
+        stop_event = threading.Event()
+        threading.Thread(target=self.run, args=(interval, stop_event), daemon=True).start()
+        return stop_event
+
+
+def read_recorded_bars(path):
+    """Bars of a JSON lines recording with symbol, timestamp, close, volume (and vwap)"""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            row = json.loads(line)
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+            yield SimpleNamespace(**row)
+
+
+def synthetic_bars(symbols, bars=390, start=None, seed=0, spikes=None, price=100.0, volume=10_000):
+    """Random minute bars of the symbols, spikes = {symbol: bar index} adds a volume and price jump"""
+    rng = np.random.default_rng(seed)
+    start = start or datetime.now().replace(hour=9, minute=30, second=0, microsecond=0)
+    spikes = spikes or {}
+    closes = {symbol: price for symbol in symbols}
+    for index in range(bars):
+        timestamp = start + timedelta(minutes=index)
+        for symbol in symbols:
+            factor = 1.0
+            step = rng.normal(0, 0.001)
+            if spikes.get(symbol) == index:
+                factor, step = 8.0, 0.02
+            closes[symbol] *= float(np.exp(step))
+            yield SimpleNamespace(symbol=symbol, timestamp=timestamp, close=closes[symbol],
+                                  volume=float(volume * factor * rng.uniform(0.7, 1.3)), vwap=None)
+
+
+def self_check():
+    """Replays synthetic bars with one spike and checks that exactly that spike fires"""
+    fired = []
+    engine = TriggerEngine(["AAPL", "MSFT"], lambda symbol, reason, window: fired.append((symbol, reason)))
+    start = datetime(2026, 1, 5, 9, 30)
+    count = engine.replay(synthetic_bars(["AAPL", "MSFT"], bars=120, start=start, spikes={"AAPL": 60}))
+    assert count == 1 and fired[0][0] == "AAPL" and "volume spike" in fired[0][1], fired
+    #the filing comes within the cooldown of the spike at 10:30
+    assert not engine.on_filing("AAPL", now=start + timedelta(minutes=70))
+    assert engine.on_filing("MSFT", now=start + timedelta(minutes=70))
+    print(f"TriggerEngine fired on the spike of AAPL: {fired[0][1]}")
+
+
+if __name__ == "__main__":
+    self_check()
@@ -0,0 +1,246 @@
+from alpaca.trading.requests import MarketOrderRequest, OrderSide, TimeInForce, TakeProfitRequest, StopLossRequest
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import hashlib
+import random
+import threading
+import time
+import numpy as np
+
+from instrumentation import Instrumentation
+
+#Distance of the limit price of the stop loss from its stop price
+STOP_LIMIT_OFFSET = 0.1
+
+#Alpaca accepts 2 decimals for prices of 1 USD and more, 4 decimals below
+SUB_PENNY_LIMIT = 1.0
+
+#Maximum length of an Alpaca client_order_id
+CLIENT_ORDER_ID_LENGTH = 48
+
+
+@dataclass
+class OrderIntent:
+    """Bracket order that a strategy wants to place on one account
+
+    price is the current market price the levels are checked against.
+    validate_intents rounds the levels, sets stop_limit and client_order_id
+    and lists what is wrong in errors.
+    """
+    account: str
+    symbol: str
+    side: str
+    qty: int
+    price: float
+    take_profit: float
+    stop_loss: float
+    strategy: str = ""
+    as_of: str = ""
+    stop_limit: float = None
+    client_order_id: str = None
+    errors: list = field(default_factory=list)
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+
+def tick_size(prices):
+    return np.where(prices >= SUB_PENNY_LIMIT, 0.01, 0.0001)
+
+
+def round_to_tick(values, prices):
+    tick = tick_size(prices)
+    return np.round(np.round(values / tick) * tick, 4)
+
+
+def client_order_id(intent):
+    """Same intent, same id: a retried or repeated submission is rejected by Alpaca instead of doubled"""
+    key = "|".join(str(value) for value in (
+        intent.account, intent.strategy, intent.symbol, intent.side,
+        intent.as_of, intent.take_profit, intent.stop_loss))
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return f"{intent.strategy or 'llm'}-{intent.symbol}-{digest}"[:CLIENT_ORDER_ID_LENGTH]
+
+
+def validate_intents(intents, max_distance=0.5):
+    """Checks and rounds all intents at once, returns the intents with their errors
+
+    - prices must be positive numbers and qty positive
+    - the levels are rounded to the tick size of the price
+    - a buy needs stop loss < price < take profit, a sell the reverse
+    - no level may be more than max_distance (relative) away from the price
+    - only the first valid intent per account and symbol is kept
+    """
+    if not intents:
+        return intents
+    price = np.array([intent.price if intent.price is not None else np.nan for intent in intents], dtype=float)
+    target = np.array([intent.take_profit if intent.take_profit is not None else np.nan for intent in intents], dtype=float)
+    stop = np.array([intent.stop_loss if intent.stop_loss is not None else np.nan for intent in intents], dtype=float)
+    qty = np.array([intent.qty or 0 for intent in intents], dtype=float)
+    side = np.array([intent.side for intent in intents])
+    is_buy, is_sell = side == "buy", side == "sell"
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        positive = np.isfinite(price) & np.isfinite(target) & np.isfinite(stop) & (price > 0) & (target > 0) & (stop > 0)
+        target = np.where(positive, round_to_tick(target, price), target)
+        stop = np.where(positive, round_to_tick(stop, price), stop)
+        stop_limit = round_to_tick(stop + np.where(is_buy, -STOP_LIMIT_OFFSET, STOP_LIMIT_OFFSET), price)
+
+        wrong_side = np.where(is_buy, ~((stop < price) & (price < target)), ~((target < price) & (price < stop)))
+        too_far = (np.abs(target / price - 1) > max_distance) | (np.abs(stop / price - 1) > max_distance)
+
+    checks = [
+        (qty <= 0, "qty must be positive"),
+        (~(is_buy | is_sell), "side must be buy or sell"),
+        (~positive, "prices must be positive numbers"),
+        (positive & (is_buy | is_sell) & wrong_side, "stop loss and take profit are on the wrong side of the price"),
+        (positive & too_far, f"a level is more than {max_distance:.0%} away from the price"),
+        (positive & (stop_limit <= 0), "the limit price of the stop loss is not positive"),
+    ]
+    invalid = np.zeros(len(intents), dtype=bool)
+    for mask, message in checks:
+        invalid |= mask
+        for index in np.flatnonzero(mask):
+            intents[index].errors.append(message)
+
+    seen = set()
+    for index, intent in enumerate(intents):
+        intent.take_profit, intent.stop_loss = float(target[index]), float(stop[index])
+        intent.stop_limit = float(stop_limit[index])
+        if invalid[index]:
+            continue
+        key = (intent.account, intent.symbol)
+        if key in seen:
+            intent.errors.append("duplicate order for this account and symbol")
+            continue
+        seen.add(key)
+        intent.client_order_id = client_order_id(intent)
+    return intents
+
+
+def build_bracket_order(intent):
+    """Bracket market order of a validated intent"""
+    return MarketOrderRequest(
+        symbol=intent.symbol, #The stock name
+        qty=intent.qty,
+        side=OrderSide.BUY if intent.side == "buy" else OrderSide.SELL,
+        time_in_force=TimeInForce.GTC,  # Good-Til-Cancelled
+        order_class="bracket",  # Enables stop-loss and take-profit
+        stop_loss=StopLossRequest(stop_price=intent.stop_loss, limit_price=intent.stop_limit),  # Exit if price moves against the position
+        take_profit=TakeProfitRequest(limit_price=intent.take_profit),  # Exit at profit target
+        client_order_id=intent.client_order_id
+    )
+
+
+class TokenBucket:
+    """Allows rate requests per second on average and bursts of capacity requests"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def status_code(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+class OrderPipeline:
+    """Validates collected intents and submits them concurrently
+
+    Every account has its own token bucket (Alpaca limits requests per
+    account), orders of different accounts and symbols are sent at the same
+    time. A 429 is retried with backoff, a rejected duplicate client order
+    id means the order was already placed by an earlier attempt. Every
+    submission is a span of the instrumentation, outcomes and retries are
+    counted. With dry_run the intents are only validated and printed.
+    """
+
+    def __init__(self, executor=None, rate_per_minute=180, burst=10, max_retries=3, max_distance=0.5, instrumentation=None,
+                 dry_run=False):
+        self.executor = executor or ThreadPoolExecutor(max_workers=8)
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_retries = max_retries
+        self.max_distance = max_distance
+        self.instrumentation = instrumentation or Instrumentation()
+        self.dry_run = dry_run
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, account_name):
+        with self.lock:
+            if account_name not in self.buckets:
+                self.buckets[account_name] = TokenBucket(self.rate_per_minute / 60, self.burst)
+            return self.buckets[account_name]
+
+    def dispatch(self, intent, account):
+        with self.instrumentation.span("submit_order", intent.symbol, account=account.name) as fields:
+            order = self.dispatch_with_retries(intent, account, fields)
+        self.instrumentation.count("orders_total", result=fields.setdefault("result", "placed" if order is not None else "skipped"))
+        return order
+
+    def dispatch_with_retries(self, intent, account, fields):
+        market_order = build_bracket_order(intent)
+        for attempt in range(self.max_retries + 1):
+            self.bucket(account.name).acquire()
+            try:
+                return account.submit_order_once(intent.symbol, market_order)
+            except Exception as e:
+                status = status_code(e)
+                if status == 422 and "client_order_id" in str(e):
+                    print(f"Order {intent.client_order_id} for {intent.symbol} on {account.name} was already submitted. \n")
+                    fields["result"] = "duplicate"
+                    return None
+                if status != 429 or attempt == self.max_retries:
+                    self.instrumentation.count("orders_total", result="failed")
+                    raise
+                self.instrumentation.count("order_retries_total", status=status)
+                time.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+
+    def submit(self, intents, accounts):
+        """Validates the intents and submits the valid ones, returns [(intent, order or None)]
+
+        accounts maps the account name of an intent to its Account.
+        """
+        validate_intents(intents, self.max_distance)
+        for intent in intents:
+            if not intent.is_valid:
+                print(f"Order for {intent.symbol} on {intent.account} rejected: {', '.join(intent.errors)} \n")
+                self.instrumentation.count("orders_total", result="rejected")
+        if self.dry_run:
+            for intent in intents:
+                if intent.is_valid:
+                    print(f"Dry run, not placed: {intent.side} {intent.qty} {intent.symbol} on {intent.account}, "
+                          f"take profit {intent.take_profit}, stop loss {intent.stop_loss} \n")
+                    self.instrumentation.count("orders_total", result="dry_run")
+            return [(intent, None) for intent in intents if intent.is_valid]
+
+        futures = [(intent, self.executor.submit(self.dispatch, intent, accounts[intent.account]))
+                   for intent in intents if intent.is_valid]
+        results = []
+        for intent, future in futures:
+            try:
+                order = future.result()
+            except Exception as e:
+                print(f"Order for {intent.symbol} on {intent.account} failed: {e} \n")
+                order = None
+            if order is not None:
+                print(f"Market order placed for {intent.symbol} on {intent.account}. Order ID: {order.id} \n")
+            results.append((intent, order))
+        return results
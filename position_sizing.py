@@ -0,0 +1,80 @@
+import numpy as np
+
+#Default limits of the risk based sizing, all relative to the account equity
+DEFAULT_SIZING = {
+    "risk_per_trade": 0.005,      #loss at the stop loss
+    "volatility_target": 0.01,    #expected daily move of one position
+    "max_position_pct": 0.05,     #notional of one position
+    "max_gross_exposure": 1.0,    #long plus short notional of the whole account
+    "max_qty": None,              #absolute cap per order
+}
+
+CONSTRAINTS = ("risk", "volatility", "notional", "max_qty", "exposure")
+
+
+def size_positions(equity, price, stop, volatility=None, gross_exposure=0.0, risk_per_trade=0.005,
+                   volatility_target=0.01, max_position_pct=0.05, max_gross_exposure=1.0, max_qty=None):
+    """Quantities of a batch of orders of one account
+
+    price, stop and volatility (daily standard deviation of the returns,
+    NaN if unknown) are arrays with one entry per order. Every order gets
+    the smallest of
+    - risk: risk_per_trade * equity lost at the stop loss
+    - volatility: a daily move of volatility_target * equity
+    - notional: max_position_pct * equity
+    - max_qty
+    and the whole batch is scaled down if it would bring the gross exposure
+    of the account above max_gross_exposure * equity. Orders without a
+    positive price or a stop loss away from it get qty 0 and the binding
+    "skipped", they do not count for the exposure.
+
+    Returns a dict of arrays: qty, the quantity allowed by every constraint,
+    scale (exposure scaling), binding (name of the limiting constraint),
+    notional and risk (loss at the stop).
+    """
+    price = np.asarray(price, dtype=float)
+    stop = np.asarray(stop, dtype=float)
+    volatility = np.full(price.shape, np.nan) if volatility is None else np.asarray(volatility, dtype=float)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stop_distance = np.abs(price - stop)
+        sizable = np.isfinite(price) & (price > 0) & np.isfinite(stop_distance) & (stop_distance > 0)
+        qty_risk = np.where(stop_distance > 0, equity * risk_per_trade / stop_distance, 0.0)
+        qty_volatility = np.where(volatility > 0, equity * volatility_target / (price * volatility), np.inf)
+        qty_notional = np.where(price > 0, equity * max_position_pct / price, 0.0)
+        qty_cap = np.full(price.shape, np.inf if max_qty is None else float(max_qty))
+
+        limits = np.vstack([qty_risk, qty_volatility, qty_notional, qty_cap])
+        limits = np.nan_to_num(limits, nan=0.0, posinf=np.inf)
+        binding = limits.argmin(axis=0)
+        qty = np.where(sizable, limits.min(axis=0), 0.0)
+
+        #the batch shares the exposure that is left on the account, a NaN price would disable the cap
+        available = max(0.0, equity * max_gross_exposure - gross_exposure)
+        wanted = (np.floor(qty[sizable]) * price[sizable]).sum()
+        scale = min(1.0, available / wanted) if wanted > 0 else 1.0
+        qty = np.floor(qty * scale)
+
+    names = np.array(CONSTRAINTS)
+    return {
+        "qty": qty.astype(np.int64),
+        "qty_risk": np.floor(qty_risk),
+        "qty_volatility": np.floor(qty_volatility),
+        "qty_notional": np.floor(qty_notional),
+        "scale": np.full(price.shape, scale),
+        "binding": np.where(~sizable, "skipped", np.where(scale < 1.0, "exposure", names[binding])),
+        "notional": np.where(sizable, qty * price, 0.0),
+        "risk": np.where(sizable, qty * stop_distance, 0.0),
+    }
+
+
+def explain(sizes, index):
+    """One line breakdown of the size of one order"""
+    def number(value):
+        return "-" if not np.isfinite(value) else f"{int(value)}"
+    if sizes["binding"][index] == "skipped":
+        return "qty 0, skipped because the price or the stop loss is not a valid number"
+    return (f"qty {int(sizes['qty'][index])} limited by {sizes['binding'][index]} "
+            f"(risk {number(sizes['qty_risk'][index])}, volatility {number(sizes['qty_volatility'][index])}, "
+            f"notional {number(sizes['qty_notional'][index])}, exposure scale {sizes['scale'][index]:.2f}; "
+            f"notional {sizes['notional'][index]:.2f}, risk at stop {sizes['risk'][index]:.2f})")
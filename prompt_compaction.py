@@ -0,0 +1,139 @@
+import json
+
+try:
+    import tiktoken
+    encoding = tiktoken.get_encoding("o200k_base")
+except ImportError:
+    encoding = None
+
+#Maximum number of estimated tokens of the JSON data per symbol
+DEFAULT_TOKEN_BUDGET = 3000
+
+#Fields of every endpoint that are passed to the model
+PROJECTIONS = {
+    "live_insider_trades": ["Date", "Name", "AcquiredDisposedCode", "TransactionCode", "Shares", "PricePerShare", "SharesOwnedFollowing"],
+    "historical_congress_trades": ["TransactionDate", "Representative", "Transaction", "Amount", "Range", "House", "Party"],
+    "historical_senate_trades": ["Date", "Senator", "Transaction", "Amount", "Range", "Party"],
+    "historical_house_trades": ["Date", "Representative", "Transaction", "Amount", "Range", "Party"],
+    "historical_gov_contracts": ["Year", "Qtr", "Amount"],
+}
+
+#Field with the date of a row and the field with the person of a row
+DATE_FIELDS = {
+    "live_insider_trades": "Date",
+    "historical_congress_trades": "TransactionDate",
+    "historical_senate_trades": "Date",
+    "historical_house_trades": "Date",
+}
+NAME_FIELDS = {
+    "live_insider_trades": "Name",
+    "historical_congress_trades": "Representative",
+    "historical_senate_trades": "Senator",
+    "historical_house_trades": "Representative",
+}
+
+
+def estimate_tokens(text):
+    """Counts tokens with tiktoken if it is installed, otherwise about 4 characters per token"""
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def dumps(data):
+    return json.dumps(data, separators=(",", ":"))
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def project(rows, fields):
+    projected = []
+    for row in rows:
+        small = {field: row[field] for field in fields if field in row}
+        projected.append(small if small else row)
+    return projected
+
+
+def signed_size(section, row):
+    """Positive for buys, negative for sells"""
+    if section == "live_insider_trades":
+        size = to_float(row.get("Shares"))
+        selling = row.get("AcquiredDisposedCode") == "D" or row.get("TransactionCode") == "S"
+    else:
+        size = to_float(row.get("Amount"))
+        selling = "sale" in str(row.get("Transaction", "")).lower()
+    return -abs(size) if selling else abs(size)
+
+
+def summarize(section, rows, top=3):
+    sizes = [signed_size(section, row) for row in rows]
+    totals = {}
+    for row, size in zip(rows, sizes):
+        name = row.get(NAME_FIELDS[section], "unknown")
+        totals[name] = totals.get(name, 0.0) + size
+    largest = sorted(totals.items(), key=lambda item: abs(item[1]), reverse=True)[:top]
+    dates = [row[DATE_FIELDS[section]] for row in rows if row.get(DATE_FIELDS[section])]
+    summary = {
+        "count": len(rows),
+        "buys": sum(1 for size in sizes if size > 0),
+        "sells": sum(1 for size in sizes if size < 0),
+        "net_shares" if section == "live_insider_trades" else "net_amount": round(sum(sizes), 2),
+        "largest_filers": [{"name": name, "net": round(total, 2)} for name, total in largest],
+    }
+    if dates:
+        summary["first_date"] = min(dates)
+        summary["last_date"] = max(dates)
+    return summary
+
+
+def compact_insider_data(all_data, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Projects, summarizes and trims the Quiver data of one symbol to the token budget
+
+    Summaries are always kept, rows are dropped starting with the smallest
+    and oldest trades until the estimated size fits the budget.
+    """
+    compact = {"symbol": all_data["symbol"], "summary": {}}
+    for section, rows in all_data.items():
+        if section == "symbol":
+            continue
+        if section in PROJECTIONS:
+            rows = project(rows, PROJECTIONS[section])
+        if section in NAME_FIELDS and rows:
+            compact["summary"][section] = summarize(section, rows)
+        compact[section] = rows
+
+    tokens = estimate_tokens(dumps(compact))
+    if tokens <= token_budget:
+        return compact
+
+    #least informative rows first: small size, then old date
+    candidates = []
+    for section, rows in compact.items():
+        if section not in PROJECTIONS:
+            continue #the political beta is never trimmed
+        for index, row in enumerate(rows):
+            date = str(row.get(DATE_FIELDS.get(section, ""), ""))
+            size = abs(signed_size(section, row)) if section in NAME_FIELDS else to_float(row.get("Amount"))
+            candidates.append((size, date, section, index, estimate_tokens(dumps(row)) + 1))
+    candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
+
+    #the per row estimates are not exact, so the result is measured again after every pass
+    rows = {section: compact[section] for section in PROJECTIONS if section in compact}
+    dropped = {}
+    position = 0
+    while tokens > token_budget and position < len(candidates):
+        while tokens > token_budget and position < len(candidates):
+            size, date, section, index, row_tokens = candidates[position]
+            dropped.setdefault(section, set()).add(index)
+            tokens -= row_tokens
+            position += 1
+        for section, indexes in dropped.items():
+            compact[section] = [row for index, row in enumerate(rows[section]) if index not in indexes]
+            compact["summary"].setdefault(section, {})["rows_dropped"] = len(indexes)
+        tokens = estimate_tokens(dumps(compact))
+    return compact
@@ -0,0 +1,184 @@
+from datetime import datetime
+from email.utils import formatdate
+from pathlib import Path
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+#Seconds a cached response is used without asking the server again
+DEFAULT_TTLS = {
+    "/beta/live/insiders": 60 * 60,
+    "/beta/live/politicalbeta": 60 * 60,
+    "/beta/historical/congresstrading": 24 * 60 * 60,
+    "/beta/historical/senatetrading": 24 * 60 * 60,
+    "/beta/historical/housetrading": 24 * 60 * 60,
+    "/beta/historical/govcontracts": 24 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60
+
+
+def endpoint_of(path):
+    """Returns the endpoint of a request path without ticker and query string"""
+    path = path.split("?", 1)[0]
+    for endpoint in DEFAULT_TTLS:
+        if path.startswith(endpoint):
+            return endpoint
+    return path
+
+
+def revalidate(path, fetch, stored, stored_name):
+    """Requests path with the validators of the stored response
+
+    stored is (etag, last_modified, stored_at) of the stored response or
+    None. Returns (status, body, headers) with lower case header names for a
+    200 or a 304, or None if the stored response (described by stored_name
+    in the warning) has to be used because the request failed. Without a
+    stored response a failed request raises.
+    """
+    extra_headers = {}
+    if stored is not None:
+        etag, last_modified, stored_at = stored
+        if etag:
+            extra_headers["If-None-Match"] = etag
+        extra_headers["If-Modified-Since"] = last_modified or formatdate(stored_at, usegmt=True)
+
+    try:
+        status, body, headers = fetch(path, extra_headers)
+    except Exception as e:
+        if stored is None:
+            raise
+        print(f"Request for {path} failed ({e}), using {stored_name} \n")
+        return None
+
+    headers = {key.lower(): value for key, value in headers.items()}
+    if status == 304 and stored is not None:
+        return status, body, headers
+    if status != 200:
+        if stored is not None:
+            print(f"Request for {path} returned {status}, using {stored_name} \n")
+            return None
+        raise RuntimeError(f"Quiver request {path} failed with status {status}")
+    return status, body, headers
+
+
+def fixture_name(path):
+    return re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") + ".json"
+
+
+class QuiverCache:
+    """SQLite cache for Quiver responses, keyed by the request path (endpoint + ticker)
+
+    The bodies are stored zlib compressed. Expired entries are revalidated with
+    ETag / If-Modified-Since, so an unchanged response costs only a 304.
+    In offline mode the network is never used: responses come from the cache
+    regardless of their age or from the recorded fixtures directory.
+    """
+
+    def __init__(self, db_path="quiver_cache.sqlite", ttls=None, fixtures_dir=None, offline=False):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " path TEXT PRIMARY KEY,"
+            " endpoint TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def ttl_for(self, path):
+        return self.ttls.get(endpoint_of(path), DEFAULT_TTL)
+
+    def load(self, path):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, fetched_at = row
+        return zlib.decompress(body), etag, last_modified, fetched_at
+
+    def store(self, path, body, etag=None, last_modified=None):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (path, endpoint_of(path), zlib.compress(body), etag, last_modified, time.time()),
+            )
+            self.db.commit()
+
+    def touch(self, path):
+        with self.lock:
+            self.db.execute("UPDATE responses SET fetched_at = ? WHERE path = ?", (time.time(), path))
+            self.db.commit()
+
+    def load_fixture(self, path):
+        if self.fixtures_dir is None:
+            return None
+        fixture = self.fixtures_dir / fixture_name(path)
+        if not fixture.exists():
+            return None
+        return fixture.read_bytes()
+
+    def get_json(self, path, fetch):
+        """Returns the parsed response for path
+
+        fetch(path, extra_headers) must perform the request and return
+        (status, body, response_headers).
+        """
+        cached = self.load(path)
+
+        if self.offline:
+            if cached is not None:
+                return json.loads(cached[0])
+            body = self.load_fixture(path)
+            if body is None:
+                raise LookupError(f"No cached response or fixture for {path} in offline mode")
+            return json.loads(body)
+
+        if cached is not None and time.time() - cached[3] < self.ttl_for(path):
+            return json.loads(cached[0])
+
+        response = revalidate(path, fetch, cached and cached[1:],
+                              cached and f"cached response from {datetime.fromtimestamp(cached[3])}")
+        if response is None:
+            return json.loads(cached[0])
+        status, body, response_headers = response
+        if status == 304:
+            self.touch(path)
+            return json.loads(cached[0])
+
+        data = json.loads(body)
+        self.store(path, body, response_headers.get("etag"), response_headers.get("last-modified"))
+        return data
+
+    def export_fixtures(self, fixtures_dir):
+        """Writes every cached response as a fixture file for offline runs"""
+        fixtures_dir = Path(fixtures_dir)
+        fixtures_dir.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            rows = self.db.execute("SELECT path, body FROM responses").fetchall()
+        for path, body in rows:
+            (fixtures_dir / fixture_name(path)).write_bytes(zlib.decompress(body))
+        return len(rows)
+
+    def clear_expired(self):
+        now = time.time()
+        with self.lock:
+            rows = self.db.execute("SELECT path, fetched_at FROM responses").fetchall()
+            expired = [(path,) for path, fetched_at in rows if now - fetched_at >= self.ttl_for(path)]
+            self.db.executemany("DELETE FROM responses WHERE path = ?", expired)
+            self.db.commit()
+        return len(expired)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
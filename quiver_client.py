@@ -0,0 +1,178 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import http.client
+import json
+import queue
+import random
+import time
+
+from instrumentation import Instrumentation
+
+#Status codes after which the request is tried again
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(value):
+    """Parses a Retry-After header, which is either seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def read_body(res, chunk_size=64 * 1024):
+    """Reads the response body chunk by chunk, so a stalled socket hits the timeout per chunk"""
+    body = bytearray()
+    while True:
+        chunk = res.read(chunk_size)
+        if not chunk:
+            break
+        body += chunk
+    return bytes(body)
+
+
+class QuiverClient:
+    """Connection pool for the Quiver API with timeouts, retries and rate limit handling
+
+    The pool should be as large as the number of threads that use it.
+    With https=False and host/port of a local stub server it can be tested offline.
+    Requests, bytes and retries are counted in the instrumentation.
+    """
+
+    def __init__(self, headers, host="api.quiverquant.com", port=None, https=True, pool_size=4,
+                 timeout=15, max_retries=4, backoff=0.5, max_backoff=30, instrumentation=None):
+        self.headers = headers
+        self.host = host
+        self.port = port
+        self.https = https
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.instrumentation = instrumentation or Instrumentation()
+        self.pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self.pool.put(None) #connections are opened on first use
+
+    def new_connection(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def backoff_delay(self, attempt):
+        #Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, path, extra_headers=None):
+        """Performs a GET request and returns (status, body, response_headers)"""
+        with self.instrumentation.span("quiver_http", path=path.split("?")[0]) as fields:
+            status, body, response_headers = self.request_with_retries(path, extra_headers)
+            fields.update(status=status, bytes=len(body))
+        return status, body, response_headers
+
+    def request_with_retries(self, path, extra_headers=None):
+        headers = {**self.headers, **(extra_headers or {})}
+        attempt = 0
+        while True:
+            conn = self.pool.get()
+            healthy = False
+            try:
+                if conn is None:
+                    conn = self.new_connection()
+                conn.request("GET", path, headers=headers)
+                res = conn.getresponse()
+                body = read_body(res)
+                response_headers = dict(res.getheaders())
+                if res.will_close:
+                    conn.close()
+                healthy = True
+            except (OSError, http.client.HTTPException) as e:
+                #Broken keep-alive socket or timeout, the connection is replaced
+                self.instrumentation.count("http_requests_total", service="quiver", status="error")
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"Quiver request {path} failed ({e}), retrying in {delay:.1f}s \n")
+            finally:
+                #The slot always goes back to the pool, after any error with a new connection
+                if not healthy and conn is not None:
+                    conn.close()
+                self.pool.put(conn if healthy else None)
+            if healthy:
+                self.instrumentation.count("http_requests_total", service="quiver", status=res.status)
+                self.instrumentation.count("http_bytes_total", len(body), service="quiver")
+                if res.status not in RETRY_STATUS or attempt >= self.max_retries:
+                    return res.status, body, response_headers
+                delay = retry_after_seconds(res.getheader("Retry-After"))
+                if delay is None:
+                    delay = self.backoff_delay(attempt)
+                #A long Retry-After would park the worker, the wait is capped like the backoff
+                delay = min(delay, self.max_backoff)
+                print(f"Quiver request {path} returned {res.status}, retrying in {delay:.1f}s \n")
+            attempt += 1
+            self.instrumentation.count("http_retries_total", service="quiver")
+            time.sleep(delay)
+
+    def get_json(self, path):
+        status, body, _ = self.request(path)
+        if status != 200:
+            raise RuntimeError(f"Quiver request {path} failed with status {status}")
+        return json.loads(body)
+
+    def close(self):
+        while not self.pool.empty():
+            conn = self.pool.get_nowait()
+            if conn is not None:
+                conn.close()
+
+
+def self_check():
+    """Runs the retry and Retry-After path against a local stub server"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import threading
+
+    statuses = [429, 503, 200]
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            status = statuses.pop(0)
+            body = json.dumps([{"Ticker": "AAPL"}]).encode() if status == 200 else b""
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "3600") #capped to max_backoff by the client
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = QuiverClient({}, host="127.0.0.1", port=server.server_address[1], https=False,
+                          pool_size=1, backoff=0.01, max_backoff=0.05)
+    try:
+        started = time.perf_counter()
+        assert client.get_json("/beta/live/insiders") == [{"Ticker": "AAPL"}]
+        assert time.perf_counter() - started < 5, "Retry-After was not capped"
+        counters = client.instrumentation.counters
+        assert counters[("http_retries_total", (("service", "quiver"),))] == 2
+        assert counters[("http_requests_total", (("service", "quiver"), ("status", "200")))] == 1
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    print("QuiverClient retried 429 and 503 and returned the body")
+
+
+if __name__ == "__main__":
+    self_check()
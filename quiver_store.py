@@ -0,0 +1,170 @@
+from datetime import date, timedelta
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from quiver_cache import DEFAULT_TTL, DEFAULT_TTLS, endpoint_of, revalidate
+
+#Days before the high-water mark that are offered again, for filings that are published late
+OVERLAP_DAYS = 60
+
+
+def row_hash(row):
+    return hashlib.sha1(json.dumps(row, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def overlap_cutoff(since):
+    """Publication date OVERLAP_DAYS before the mark, the mark itself if it is not a date"""
+    try:
+        return (date.fromisoformat(since[:10]) - timedelta(days=OVERLAP_DAYS)).isoformat()
+    except ValueError:
+        return since
+
+
+def contract_date(row):
+    """Sortable date key of a gov contract row, e.g. 2025-Q2"""
+    return f"{int(row['Year']):04d}-Q{int(row['Qtr'])}"
+
+
+class QuiverStore:
+    """Incremental SQLite store for the per-ticker Quiver endpoints
+
+    Every (endpoint, ticker) has a high-water mark: the latest publication
+    date that was ingested. A refresh only inserts rows published at most
+    OVERLAP_DAYS before it, duplicates are dropped by a hash of the row. The rows are kept in a
+    table clustered by (endpoint, ticker, date), so a date window is a range
+    scan and only the rows of the window are parsed.
+
+    fetch(path, extra_headers) performs the request and returns
+    (status, body, headers) like QuiverClient.request. A ticker is refreshed
+    at most once per TTL of its endpoint, unchanged responses cost only a 304.
+    In offline mode only the stored rows are used, fallback_get(path) (e.g.
+    the QuiverCache with its fixtures) fills tickers that were never ingested.
+    """
+
+    def __init__(self, db_path="quiver_store.sqlite", fetch=None, ttls=None, offline=False, fallback_get=None):
+        self.fetch = fetch
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.offline = offline
+        self.fallback_get = fallback_get
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS filings ("
+            " endpoint TEXT NOT NULL,"
+            " ticker TEXT NOT NULL,"
+            " date TEXT NOT NULL,"
+            " published TEXT NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " row TEXT NOT NULL,"
+            " PRIMARY KEY (endpoint, ticker, date, hash)) WITHOUT ROWID"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS high_water ("
+            " endpoint TEXT NOT NULL,"
+            " ticker TEXT NOT NULL,"
+            " published TEXT,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " refreshed_at REAL NOT NULL,"
+            " PRIMARY KEY (endpoint, ticker))"
+        )
+        self.db.commit()
+
+    def high_water(self, endpoint, ticker):
+        with self.lock:
+            return self.db.execute(
+                "SELECT published, etag, last_modified, refreshed_at FROM high_water WHERE endpoint = ? AND ticker = ?",
+                (endpoint, ticker)
+            ).fetchone()
+
+    def ingest(self, endpoint, ticker, rows, date_key, published_key, etag=None, last_modified=None, replace_dates=False):
+        """Inserts the rows published at most OVERLAP_DAYS before the high-water mark, returns the number of new rows
+
+        Only rows with a publication date are cut off. The overlap catches
+        rows that show up after the mark was moved past their date, the row
+        hash drops the ones that are already stored. A row
+        without one (e.g. a congress trade disclosed weeks after the trade)
+        is always offered to the table, the row hash drops it if it is known.
+        With replace_dates the stored rows of every date in the new rows are
+        replaced, for endpoints that revise a row (e.g. the total of a quarter).
+        """
+        mark = self.high_water(endpoint, ticker)
+        since = mark[0] if mark and mark[0] else ""
+        cutoff = overlap_cutoff(since)
+        new = []
+        for row in rows:
+            row_date = date_key(row)
+            published = published_key(row)
+            if published and published < cutoff:
+                continue
+            published = published or row_date
+            new.append((endpoint, ticker, row_date, published, row_hash(row), json.dumps(row, separators=(",", ":"))))
+        latest = max([since] + [item[3] for item in new])
+
+        with self.lock:
+            if replace_dates:
+                self.db.executemany("DELETE FROM filings WHERE endpoint = ? AND ticker = ? AND date = ?",
+                                    {(endpoint, ticker, item[2]) for item in new})
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO filings VALUES (?, ?, ?, ?, ?, ?)", new)
+            inserted = self.db.total_changes - before
+            self.db.execute(
+                "INSERT OR REPLACE INTO high_water VALUES (?, ?, ?, ?, ?, ?)",
+                (endpoint, ticker, latest or None, etag, last_modified, time.time())
+            )
+            self.db.commit()
+        return inserted
+
+    def refresh(self, path, ticker, date_key, published_key, replace_dates=False):
+        """Brings one ticker of one endpoint up to date if its TTL is over"""
+        endpoint = endpoint_of(path)
+        mark = self.high_water(endpoint, ticker)
+
+        if self.offline or self.fetch is None:
+            if mark is None and self.fallback_get is not None:
+                self.ingest(endpoint, ticker, self.fallback_get(path), date_key, published_key, replace_dates=replace_dates)
+            return 0
+        if mark is not None and time.time() - mark[3] < self.ttls.get(endpoint, DEFAULT_TTL):
+            return 0
+
+        response = revalidate(path, self.fetch, mark and mark[1:], "stored rows")
+        if response is None:
+            return 0
+        status, body, headers = response
+        if status == 304:
+            with self.lock:
+                self.db.execute("UPDATE high_water SET refreshed_at = ? WHERE endpoint = ? AND ticker = ?",
+                                (time.time(), endpoint, ticker))
+                self.db.commit()
+            return 0
+        return self.ingest(endpoint, ticker, json.loads(body), date_key, published_key,
+                           headers.get("etag"), headers.get("last-modified"), replace_dates)
+
+    def window(self, endpoint, ticker, start, end, published_before=None):
+        """Rows with start < date < end (and published before published_before), sorted by date"""
+        query = "SELECT row FROM filings WHERE endpoint = ? AND ticker = ? AND date > ? AND date < ?"
+        params = [endpoint, ticker, start, end]
+        if published_before is not None:
+            query += " AND published < ?"
+            params.append(published_before)
+        with self.lock:
+            rows = self.db.execute(query + " ORDER BY date", params).fetchall()
+        return [json.loads(row) for (row,) in rows]
+
+    def trades(self, path, ticker, date_field, published_field, start, end, published_before=None):
+        """Refreshes a trade endpoint of the ticker and returns its rows in the window"""
+        self.refresh(path + ticker, ticker, lambda row: row[date_field], lambda row: row.get(published_field))
+        return self.window(endpoint_of(path + ticker), ticker, start, end, published_before)
+
+    def contracts(self, path, ticker, after_year, until_year, until_quarter):
+        """Refreshes the gov contracts of the ticker and returns the quarters after after_year up to the given quarter"""
+        self.refresh(path + ticker, ticker, contract_date, lambda row: None, replace_dates=True)
+        rows = self.window(endpoint_of(path + ticker), ticker, f"{after_year:04d}-Q9", f"{until_year:04d}-Q{until_quarter + 1}")
+        return [row for row in rows if row["Qtr"] >= 1]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,347 @@
+from alpaca.trading.client import TradingClient
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+from pathlib import Path
+import argparse
+import json
+import os
+import pandas as pd
+
+from analytics import MetricsCache
+from timeseries_store import TimeSeriesStore, fetch_parallel
+
+NORMALIZATIONS = ("offset", "percent", "invested", "raw")
+FORMATS = ("png", "svg", "pdf")
+
+#Figure, die ein Render-Prozess für alle seine Diagramme wiederverwendet
+_figure = None
+
+
+def load_config(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def use_headless_backend():
+    """Erzwingt das nicht-interaktive Agg-Backend, muss vor pyplot geladen werden"""
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+def expand_charts(config, names):
+    """Wählt die Diagramme aus und vervielfacht Vorlagen
+
+    Ein Diagramm mit "each": "accounts" oder "benchmarks" wird für jede Quelle
+    einmal erzeugt, "{source}" in Titel und Reihen wird ersetzt. Mit
+    "periods": [30, 90, ...] entsteht je Zeitraum (in Tagen) ein Diagramm.
+    """
+    selected = {}
+    for name in names:
+        template = config["charts"][name]
+        variants = {name: dict(template)}
+        if template.get("each"):
+            variants = {}
+            for source in config[template["each"]]:
+                chart = json.loads(json.dumps(template).replace("{source}", source))
+                variants[f"{name}_{source.strip('^')}"] = chart
+        for variant, chart in variants.items():
+            if chart.get("periods"):
+                for days in chart["periods"]:
+                    period = dict(chart, days=days)
+                    period.pop("start", None)
+                    selected[f"{variant}_{days}d"] = period
+            else:
+                selected[variant] = chart
+    return selected
+
+
+def chart_range(chart, now):
+    """Zeitraum eines Diagramms: start/end aus der Konfiguration oder die letzten days Tage"""
+    end = pd.Timestamp(chart["end"]) if chart.get("end") else pd.Timestamp(now)
+    if chart.get("start"):
+        start = pd.Timestamp(chart["start"])
+    else:
+        start = end - pd.Timedelta(days=chart.get("days", 90))
+    return start.normalize(), end
+
+
+def fetch_sources(config, charts, store, now, timeout=60, extra_sources=()):
+    """Holt jede benötigte Quelle genau einmal, für den größten Zeitraum aller Diagramme
+
+    extra_sources werden zusätzlich für jeden Diagramm-Zeitraum geholt, z.B. die
+    Benchmark der Kennzahlen.
+    """
+    ranges = {}
+    for chart in charts.values():
+        start, end = chart_range(chart, now)
+        for source in [series["source"] for series in chart["series"]] + list(extra_sources):
+            old = ranges.get(source, (start, end))
+            ranges[source] = (min(old[0], start), max(old[1], end))
+
+    jobs = {}
+    for source, (start, end) in ranges.items():
+        if source in config["accounts"]:
+            account = config["accounts"][source]
+            client = TradingClient(os.getenv(account["api_key_env"]), os.getenv(account["secret_key_env"]), paper=True)
+            jobs[source] = lambda source=source, client=client, start=start, end=end: store.equity(source, client, start, end)
+        elif source in config["benchmarks"]:
+            jobs[source] = lambda source=source, start=start, end=end: store.benchmark(source, start, end)
+        else:
+            raise KeyError(f"Quelle {source} ist weder Konto noch Benchmark")
+    return fetch_parallel(jobs, timeout=timeout)
+
+
+def build_frame(config, raw):
+    """Alle Quellen als Spalten eines DataFrames mit Tagesdatum als Index
+
+    Konten werden auf tägliche Frequenz gebracht, Benchmarks behalten ihre Handelstage.
+    """
+    columns = {}
+    for source, data in raw.items():
+        if source in config["accounts"]:
+            series = data["equity"].copy()
+            series.index = series.index.normalize()
+            series = series[~series.index.duplicated(keep="last")].resample("D").ffill()
+        else:
+            series = data["Adj Close"] if "Adj Close" in data.columns else data["Close"]
+            series = series.copy()
+            series.index = series.index.normalize()
+        columns[source] = series.astype(float)
+    return pd.DataFrame(columns).sort_index()
+
+
+def normalize(config, chart, frame):
+    """Normiert alle Reihen eines Diagramms in einem Schritt"""
+    sources = [series["source"] for series in chart["series"] if series["source"] in frame.columns]
+    start, end = chart["range"]
+    data = frame.loc[(frame.index >= start) & (frame.index <= end), sources]
+    if chart.get("align") == "common":
+        data = data.dropna() # nur Tage, an denen alle Reihen Werte haben
+
+    first = data.bfill().iloc[0] if len(data) else pd.Series(dtype=float)
+    modes = {series["source"]: series.get("normalization", chart.get("normalization", "raw")) for series in chart["series"]}
+    result = data.copy()
+    for mode in set(modes.values()):
+        if mode not in NORMALIZATIONS:
+            raise ValueError(f"Unbekannte Normierung {mode}")
+        cols = [source for source in sources if modes[source] == mode]
+        if not cols:
+            continue
+        if mode == "offset":
+            offsets = pd.Series({source: config["accounts"].get(source, {}).get("offset", 0) for source in cols})
+            result[cols] = data[cols] - offsets
+        elif mode == "percent":
+            result[cols] = data[cols] / first[cols] * 100
+        elif mode == "invested":
+            invested = pd.Series({source: config["benchmarks"].get(source, {}).get("invested", 100) for source in cols})
+            result[cols] = data[cols] / first[cols] * invested
+    return result
+
+
+def render_chart(chart, data, figure=None):
+    """Zeichnet ein Diagramm und gibt die Figure zurück
+
+    Eine übergebene Figure wird geleert und wiederverwendet.
+    """
+    import matplotlib.pyplot as plt
+
+    title_fontsize = chart.get("title_fontsize", 14)
+    label_fontsize = chart.get("label_fontsize", 12)
+    figsize = tuple(chart.get("figsize", (14, 7)))
+    if figure is None:
+        figure = plt.figure(figsize=figsize)
+    else:
+        figure.clear()
+        figure.set_size_inches(figsize)
+    axes = figure.add_subplot()
+    for series in chart["series"]:
+        source = series["source"]
+        if source not in data.columns:
+            continue
+        values = data[source].dropna()
+        axes.plot(
+            values.index,
+            values,
+            label=series.get("label", source.replace("_", " ").capitalize()),
+            color=series.get("color"),
+            linestyle=series.get("linestyle", "solid"),
+            linewidth=series.get("linewidth", 2),
+            alpha=series.get("alpha")
+        )
+    axes.set_title(chart["title"], fontsize=title_fontsize)
+    axes.set_xlabel(chart.get("xlabel", "Datum"), fontsize=label_fontsize)
+    axes.set_ylabel(chart.get("ylabel", ""), fontsize=label_fontsize)
+    axes.legend()
+    axes.grid(True, alpha=chart.get("grid_alpha", 0.3))
+    figure.tight_layout()
+    return figure
+
+
+def chart_metrics(config, charts, frame, cache):
+    """Kennzahlen der Konten jedes Diagramms über dessen Zeitraum
+
+    Die Benchmark und der risikofreie Zins kommen aus "metrics" der Konfiguration.
+    Gibt {Diagramm: DataFrame} zurück, Diagramme ohne Konten fehlen.
+    """
+    settings = config.get("metrics", {})
+    benchmark_name = settings.get("benchmark", "^GSPC")
+    benchmark = frame[benchmark_name] if benchmark_name in frame.columns else None
+    if benchmark is None:
+        print(f"Keine Daten für {benchmark_name}, Kennzahlen ohne Alpha und Beta")
+    tables = {}
+    for name, chart in charts.items():
+        accounts = [series["source"] for series in chart["series"]
+                    if series["source"] in config["accounts"] and series["source"] in frame.columns]
+        if not accounts:
+            continue
+        start, end = chart["range"]
+        tables[name] = cache.metrics(frame[accounts], start, end, benchmark=benchmark,
+                                     benchmark_name=benchmark_name, risk_free=settings.get("risk_free", 0.0))
+    return tables
+
+
+def print_metrics(tables):
+    for name, table in tables.items():
+        print(f"\n{name}")
+        print(table.to_string(float_format=lambda value: f"{value:.4f}"))
+
+
+def output_paths(name, chart, output_dir, formats):
+    """Dateien eines Diagramms im Ausgabeordner, eine je Format"""
+    stem = Path(chart["output"]).stem if chart.get("output") else name
+    return [Path(output_dir) / f"{stem}.{fmt}" for fmt in formats]
+
+
+def render_job(job):
+    """Zeichnet ein Diagramm im Render-Prozess und schreibt seine Dateien
+
+    Läuft in einem eigenen Prozess, dort wird immer Agg benutzt und eine
+    Figure für alle Diagramme des Prozesses wiederverwendet.
+    """
+    global _figure
+    name, chart, data, paths = job
+    use_headless_backend()
+    _figure = render_chart(chart, data, _figure)
+    for path in paths:
+        _figure.savefig(path, dpi=chart.get("dpi", 300))
+    return name, [str(path) for path in paths]
+
+
+def render_headless(jobs, workers=None):
+    """Zeichnet alle Diagramme ohne Anzeige, mit workers > 1 in einem Prozess-Pool"""
+    written, errors = {}, {}
+    if workers is not None and workers <= 1:
+        results = []
+        for job in jobs:
+            try:
+                results.append(render_job(job))
+            except Exception as e:
+                errors[job[0]] = e
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(render_job, job): job[0] for job in jobs}
+            for future, name in futures.items():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors[name] = e
+    for name, paths in results:
+        written[name] = paths
+    for name, error in errors.items():
+        print(f"Diagramm {name} fehlgeschlagen: {error}")
+    return written, errors
+
+
+def run_report(config_path="report_config.json", charts=None, show=True, timeout=60,
+               headless=False, output_dir=None, formats=("png",), workers=None, metrics=False):
+    """Holt alle Quellen einmal und zeichnet die gewählten Diagramme
+
+    Interaktiv werden alle Diagramme in einem Prozess gezeichnet und angezeigt.
+    Mit headless=True wird nichts angezeigt: die Diagramme werden mit Agg in
+    einem Prozess-Pool gezeichnet und als Dateien in output_dir geschrieben.
+    Gibt dann {Diagramm: [Dateien]} zurück.
+    Mit metrics=True werden zusätzlich die Kennzahlen der Konten jedes
+    Diagramms ausgegeben, headless auch als metrics.csv im Ausgabeordner.
+    """
+    if headless:
+        use_headless_backend()
+    import matplotlib.pyplot as plt
+
+    load_dotenv()
+    config = load_config(config_path)
+    if not charts:
+        #Vorlagen erzeugen viele Diagramme und werden interaktiv nur auf Wunsch gezeichnet
+        charts = [name for name, chart in config["charts"].items()
+                  if headless or not (chart.get("each") or chart.get("periods"))]
+    selected = expand_charts(config, charts)
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unbekanntes Format {fmt}, erlaubt sind {FORMATS}")
+
+    now = datetime.now()
+    for chart in selected.values():
+        chart["range"] = chart_range(chart, now)
+
+    store = TimeSeriesStore(offline=os.getenv("REPORT_OFFLINE") == "1")
+    extra_sources = [config.get("metrics", {}).get("benchmark", "^GSPC")] if metrics else []
+    raw, errors = fetch_sources(config, selected, store, now, timeout=timeout, extra_sources=extra_sources)
+    frame = build_frame(config, raw)
+
+    tables = {}
+    if metrics:
+        tables = chart_metrics(config, selected, frame, MetricsCache(store.root / "metrics.parquet"))
+        print_metrics(tables)
+
+    if headless:
+        output_dir = Path(output_dir or os.getenv("REPORT_OUTPUT_DIR", "reports"))
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if tables:
+            pd.concat(tables, names=["chart", "account"]).to_csv(output_dir / "metrics.csv")
+        jobs = [(name, chart, normalize(config, chart, frame), output_paths(name, chart, output_dir, formats))
+                for name, chart in selected.items()]
+        written, _ = render_headless(jobs, workers=workers)
+        print(f"{sum(len(paths) for paths in written.values())} Dateien in {output_dir} geschrieben")
+        return written
+
+    figures = {}
+    for name, chart in selected.items():
+        figure = render_chart(chart, normalize(config, chart, frame))
+        if chart.get("output"):
+            figure.savefig(chart["output"], dpi=chart.get("dpi", 300))
+        figures[name] = figure
+    if show:
+        plt.show()
+    return figures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zeichnet die Portfolio- und Benchmark-Diagramme aus der Konfiguration")
+    parser.add_argument("--config", default="report_config.json")
+    parser.add_argument("--chart", action="append", help="Name eines Diagramms aus der Konfiguration, mehrfach möglich")
+    parser.add_argument("--timeout", type=float, default=float(os.getenv("REPORT_FETCH_TIMEOUT", "60")))
+    parser.add_argument("--list", action="store_true", help="zeigt die Diagramme der Konfiguration")
+    parser.add_argument("--headless", action="store_true", default=os.getenv("REPORT_HEADLESS") == "1",
+                        help="ohne Anzeige zeichnen und nur Dateien schreiben")
+    parser.add_argument("--output-dir", default=os.getenv("REPORT_OUTPUT_DIR", "reports"))
+    parser.add_argument("--format", action="append", choices=FORMATS, help="Dateiformat, mehrfach möglich (Standard png)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Render-Prozesse, 1 zeichnet im Hauptprozess")
+    parser.add_argument("--metrics", action="store_true", help="Rendite, Drawdown, Sharpe/Sortino, Alpha/Beta der Konten ausgeben")
+    args = parser.parse_args()
+
+    if args.list:
+        config = load_config(args.config)
+        for name, chart in expand_charts(config, list(config["charts"])).items():
+            print(f"{name}: {chart['title']}")
+        return
+    if args.headless:
+        run_report(args.config, charts=args.chart, timeout=args.timeout, headless=True,
+                   output_dir=args.output_dir, formats=args.format or ["png"], workers=args.workers,
+                   metrics=args.metrics)
+    else:
+        run_report(args.config, charts=args.chart, timeout=args.timeout, metrics=args.metrics)
+
+
+if __name__ == "__main__":
+    main()
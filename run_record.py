@@ -0,0 +1,51 @@
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+
+#Directory of the recorded runs, one file per live process
+RUN_RECORD_DIR = "run_records"
+
+
+def record_path(as_of, directory=RUN_RECORD_DIR):
+    return Path(directory) / f"run_{as_of:%Y%m%d_%H%M%S}.json"
+
+
+def save_run_record(path, as_of, snapshot, accounts=None, volatility=None):
+    """Writes as_of, the market snapshot, the account state and the volatility of a run
+
+    The prompts and the sizing of the run can be rebuilt from them without
+    any request to Alpaca. accounts maps the account name to its positions,
+    open order symbols and equity (see AccountState.to_record).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump({"as_of": as_of.isoformat(), "snapshot": snapshot, "accounts": accounts or {},
+                   "volatility": volatility or {}}, file, default=str)
+    os.replace(temporary, path)
+
+
+def load_run_record(path):
+    """Returns the record of a run with as_of as datetime"""
+    with open(path, encoding="utf-8") as file:
+        record = json.load(file)
+    record["as_of"] = datetime.fromisoformat(record["as_of"])
+    record.setdefault("accounts", {})
+    record.setdefault("volatility", {})
+    return record
+
+
+def latest_run_record(directory=RUN_RECORD_DIR):
+    paths = sorted(Path(directory).glob("run_*.json"))
+    return paths[-1] if paths else None
+
+
+def run_records_by_day(directory=RUN_RECORD_DIR):
+    """date -> [(as_of, snapshot)] of all recorded runs, the latest run of a day first"""
+    days = {}
+    for path in sorted(Path(directory).glob("run_*.json"), reverse=True):
+        record = load_run_record(path)
+        days.setdefault(record["as_of"].date(), []).append((record["as_of"], record["snapshot"]))
+    return days
@@ -0,0 +1,736 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from functools import cached_property
+from dotenv import load_dotenv
+import argparse
+import json
+import os
+import threading
+import numpy as np
+
+from account_state import AccountState
+from instrumentation import Instrumentation
+from llm_batch import OpenAIBatchBackend, run_batch
+from llm_cache import LLMCache
+from market_data import fetch_daily_volatility, fetch_market_snapshot
+from order_pipeline import OrderIntent, OrderPipeline
+from position_sizing import DEFAULT_SIZING, explain, size_positions
+from prompt_compaction import DEFAULT_TOKEN_BUDGET, compact_insider_data, dumps, estimate_tokens
+from run_record import RUN_RECORD_DIR, latest_run_record, load_run_record, record_path, save_run_record
+from trade_parser import parse_instruction
+from insider_strategy import build_chat_prompt as build_insider_prompt, collect_insider_data
+from web_strategy import build_chat_prompt as build_web_prompt
+
+#Default accounts: environment variables with the keys and the strategy that trades on the account,
+#more accounts are added with an accounts config (see accounts_config.json)
+ACCOUNTS = {
+    "insider": {"api_key_env": "ALPACA_API_INSIDE_KEY", "secret_key_env": "ALPACA_SECRET_INSIDE_KEY",
+                "openai_key_env": "OPENAI_API_INSIDE_KEY", "strategy": "insider"},
+    "web": {"api_key_env": "ALPACA_API_WEB_KEY", "secret_key_env": "ALPACA_SECRECT_WEB_KEY",
+            "openai_key_env": "OPENAI_API_WEB_KEY", "strategy": "web"},
+}
+
+#Quantity of an order of an account with "sizing": "fixed" that does not set its qty
+DEFAULT_QTY = 15
+
+#Feeds that contain every ticker at once, they are downloaded only once per process
+UNIVERSE_FEEDS = {
+    "politicalbeta": "/beta/live/politicalbeta",
+}
+
+DEFAULT_SYMBOLS = ["NVDA", "LLY", "JPM", "PG", "XOM", "UNP", "META", "LMT", "TSLA", "WMT"]
+
+
+def index_by_ticker(rows):
+    index = {}
+    for item in rows:
+        index.setdefault(item["Ticker"], []).append(item)
+    return index
+
+
+def load_accounts(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)["accounts"]
+
+
+class Account:
+    """Clients and order state of one Alpaca account, created on first use
+
+    Only one order is submitted at a time and every symbol only once per
+    process, so strategies that share the account do not double up.
+    The config holds the keys (api_key_env, secret_key_env, openai_key_env)
+    and the sizing and risk limits of the account: "sizing" is "risk"
+    (default, limits in "risk", see position_sizing.DEFAULT_SIZING) or
+    "fixed" (qty), max_notional caps every order, allow_short and
+    max_orders per run.
+    """
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.api_key = os.getenv(config["api_key_env"])
+        self.secret_key = os.getenv(config["secret_key_env"])
+        self.openai_key = os.getenv(config.get("openai_key_env", ""))
+        self.order_lock = threading.Lock()
+        self.submitted_symbols = set()
+        self.trade_listener = None
+        self.recorded = None #state of the account in a replayed run
+        self.info = None
+
+    @cached_property
+    def trading_client(self):
+        from alpaca.trading.client import TradingClient
+        return TradingClient(self.api_key, self.secret_key, paper=True)
+
+    @cached_property
+    def account_state(self):
+        #Positions and open orders are loaded once, ALPACA_TRADE_UPDATES=1 keeps them fresh from the stream
+        #and appends fills and rejections to the fill log
+        if self.recorded is not None:
+            return AccountState.from_record(self.recorded)
+        state = AccountState(self.trading_client)
+        if os.getenv("ALPACA_TRADE_UPDATES") == "1":
+            from trade_listener import TradeListener, fill_log_path, shared_fill_log
+            #FILL_LOG_PATH may contain {account}, accounts that log into one file share its writer
+            self.trade_listener = TradeListener(state, shared_fill_log(fill_log_path(self.name)), account=self.name)
+            self.trade_listener.start(self.api_key, self.secret_key, paper=True)
+        return state
+
+    def account_info(self):
+        """Equity and market values of the account, in a replayed run from the run record"""
+        if self.recorded is not None:
+            if "info" not in self.recorded:
+                raise LookupError(f"The replayed run has no equity of {self.name}, use fixed sizing or record a new run")
+            self.info = self.recorded["info"]
+            return self.info
+        account = self.trading_client.get_account()
+        self.info = {"equity": float(account.equity),
+                     "long_market_value": float(account.long_market_value or 0),
+                     "short_market_value": float(account.short_market_value or 0)}
+        return self.info
+
+    def has_position(self, symbol):
+        return self.account_state.has_position(symbol)
+
+    def has_open_order(self, symbol):
+        return self.account_state.has_open_order(symbol)
+
+    def submit_order_once(self, symbol, market_order):
+        #The symbol is reserved under the lock, the request itself runs outside of it
+        with self.order_lock:
+            if symbol in self.submitted_symbols or self.has_position(symbol) or self.has_open_order(symbol):
+                print(f"Order for {symbol} skipped, it was already submitted. \n")
+                return None
+            self.submitted_symbols.add(symbol)
+        try:
+            order = self.trading_client.submit_order(market_order)
+        except Exception:
+            with self.order_lock:
+                self.submitted_symbols.discard(symbol)
+            raise
+        self.account_state.record_order(order)
+        if self.trade_listener is not None:
+            self.trade_listener.track(order)
+        return order
+
+    def accepts(self, symbol, side):
+        """False if the limits of the account exclude the order"""
+        if side == "sell" and not self.config.get("allow_short", True):
+            print(f"{self.name}: short positions are disabled, {symbol} skipped. \n")
+            return False
+        max_orders = self.config.get("max_orders")
+        if max_orders is not None and len(self.submitted_symbols) >= max_orders:
+            print(f"{self.name}: {max_orders} orders placed in this run, {symbol} skipped. \n")
+            return False
+        return True
+
+    def within_max_orders(self, intents):
+        """The first intents up to max_orders (minus the orders already placed in this run), the rest is skipped"""
+        max_orders = self.config.get("max_orders")
+        if max_orders is None:
+            return intents
+        left = max(0, max_orders - len(self.submitted_symbols))
+        for intent in intents[left:]:
+            print(f"{self.name}: {max_orders} orders placed in this run, {intent.symbol} skipped. \n")
+        return intents[:left]
+
+    def size(self, intents, context):
+        """Sets the qty of all intents of this account in one pass"""
+        if not intents:
+            return intents
+        price = np.array([intent.price for intent in intents], dtype=float)
+        if self.config.get("sizing", "risk") == "fixed":
+            qty = np.full(len(intents), int(self.config.get("qty", DEFAULT_QTY)))
+            lines = [f"fixed qty {qty[0]}"] * len(intents)
+        else:
+            with context.instrumentation.span("account", account=self.name):
+                account = self.account_info()
+            context.save_run_record()
+            gross_exposure = abs(account["long_market_value"]) + abs(account["short_market_value"])
+            try:
+                volatility = context.volatility([intent.symbol for intent in intents])
+            except Exception as e:
+                #The volatility is an optional limit, the orders are sized without it
+                print(f"Daily volatility could not be loaded ({e}), {self.name} is sized without it. \n")
+                volatility = {}
+            limits = dict(DEFAULT_SIZING, **self.config.get("risk", {}))
+            sizes = size_positions(
+                account["equity"], price, [intent.stop_loss for intent in intents],
+                volatility=[volatility.get(intent.symbol, np.nan) for intent in intents],
+                gross_exposure=gross_exposure, **limits)
+            qty = sizes["qty"]
+            lines = [explain(sizes, index) for index in range(len(intents))]
+
+        max_notional = self.config.get("max_notional")
+        if max_notional is not None:
+            qty = np.fmin(qty, np.floor(max_notional / price)).astype(np.int64)
+        for intent, value, line in zip(intents, qty, lines):
+            intent.qty = int(value)
+            print(f"Size of {intent.symbol} on {self.name}: {line} \n")
+        return intents
+
+
+class Context:
+    """Resources that all strategies of one process share
+
+    Every client is built on first use. The market data snapshot, the Quiver
+    connections, caches and feeds and the LLM cache exist once, however many
+    strategies and variants run in the process. All of them report their
+    timings, requests and token costs to one Instrumentation.
+
+    A live run records its as_of, snapshot, account state and volatility in
+    RUN_RECORD_DIR. LLM_REPLAY=1 is a read-only dry run of the recorded run
+    (LLM_REPLAY_RECORD or the latest one): the clock, the market data and
+    the accounts come from the record, Quiver is read offline, the answers
+    come from the LLM cache and the orders are only validated and printed.
+    """
+
+    def __init__(self, account_configs=None):
+        load_dotenv()
+        self.account_configs = dict(ACCOUNTS, **(account_configs or {}))
+        self.enabled_accounts = [name for name, config in (account_configs or ACCOUNTS).items() if config.get("enabled", True)]
+        self.data_account_name = None #first account of the first strategy run
+        self.accounts = {}
+        self.snapshot = {}
+        self.volatilities = {}
+        self.recorded_accounts = {}
+        self.lock = threading.Lock()
+        self.record_lock = threading.Lock()
+
+    def account(self, name):
+        with self.lock:
+            if name not in self.accounts:
+                account = Account(name, self.account_configs[name])
+                if self.replay:
+                    account.recorded = self.run_record["accounts"].get(name, {})
+                self.accounts[name] = account
+            return self.accounts[name]
+
+    @cached_property
+    def replay(self):
+        return os.getenv("LLM_REPLAY") == "1"
+
+    @cached_property
+    def run_record(self):
+        """Record of the run that is replayed, see run_record.load_run_record"""
+        path = os.getenv("LLM_REPLAY_RECORD") or latest_run_record(os.getenv("RUN_RECORD_DIR", RUN_RECORD_DIR))
+        if path is None:
+            raise LookupError("No recorded run to replay, run once without LLM_REPLAY first")
+        print(f"Replaying the run recorded in {path} \n")
+        return load_run_record(path)
+
+    @cached_property
+    def as_of(self):
+        """Time of the decisions of this process, all strategies and accounts share it"""
+        return self.run_record["as_of"] if self.replay else datetime.now()
+
+    def save_run_record(self):
+        """Writes the state the decisions of this live run are based on, the first state of every account is kept"""
+        if self.replay:
+            return
+        with self.record_lock:
+            with self.lock:
+                accounts = list(self.accounts.values())
+                snapshot, volatilities = dict(self.snapshot), dict(self.volatilities)
+            for account in accounts:
+                recorded = self.recorded_accounts.setdefault(account.name, {})
+                if "account_state" in account.__dict__ and "positions" not in recorded:
+                    recorded.update(account.account_state.to_record())
+                if account.info is not None and "info" not in recorded:
+                    recorded["info"] = account.info
+            save_run_record(record_path(self.as_of, os.getenv("RUN_RECORD_DIR", RUN_RECORD_DIR)),
+                            self.as_of, snapshot, self.recorded_accounts, volatilities)
+
+    @cached_property
+    def instrumentation(self):
+        #Spans and LLM calls are appended to RUN_LOG_PATH (empty to keep no log),
+        #LLM_PRICES adds or overrides the USD prices per 1M tokens, e.g. {"gpt-4.1": [2.0, 8.0]}
+        return Instrumentation(
+            log_path=os.getenv("RUN_LOG_PATH", "run_log.jsonl") or None,
+            prices=json.loads(os.getenv("LLM_PRICES", "{}")))
+
+    def report(self):
+        """Prints the summary table, METRICS_PROMETHEUS_PATH also gets the metrics in the Prometheus text format"""
+        print(self.instrumentation.summary() + "\n")
+        if os.getenv("METRICS_PROMETHEUS_PATH"):
+            self.instrumentation.write_prometheus(os.getenv("METRICS_PROMETHEUS_PATH"))
+
+    @cached_property
+    def order_pipeline(self):
+        #Orders are validated together and sent concurrently, ORDER_RATE_PER_MINUTE per account
+        return OrderPipeline(
+            ThreadPoolExecutor(max_workers=int(os.getenv("ORDER_CONCURRENCY", "8"))),
+            rate_per_minute=float(os.getenv("ORDER_RATE_PER_MINUTE", "180")),
+            max_distance=float(os.getenv("ORDER_MAX_DISTANCE", "0.5")),
+            instrumentation=self.instrumentation,
+            dry_run=self.replay)
+
+    @cached_property
+    def data_account(self):
+        """Account whose keys are used for market data
+
+        ALPACA_DATA_ACCOUNT overrides it, otherwise it is the account of the
+        first strategy run of the context (LLM_Web.py uses the web keys).
+        """
+        return self.account(os.getenv("ALPACA_DATA_ACCOUNT") or self.data_account_name
+                            or next(iter(self.enabled_accounts), "insider"))
+
+    @cached_property
+    def data_client(self):
+        from alpaca.data.historical import StockHistoricalDataClient
+        return StockHistoricalDataClient(self.data_account.api_key, self.data_account.secret_key)
+
+    @cached_property
+    def live_stream(self):
+        from alpaca.data.live import StockDataStream
+        return StockDataStream(self.data_account.api_key, self.data_account.secret_key)
+
+    @cached_property
+    def llm_cache(self):
+        #Answers of the model are cached by prompt, LLM_REPLAY=1 replays a run only from the cache
+        return LLMCache(
+            db_path=os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite"),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+            max_age=float(os.getenv("LLM_CACHE_MAX_AGE", str(24 * 60 * 60))),
+            replay=self.replay,
+            instrumentation=self.instrumentation)
+
+    @cached_property
+    def quiver_client(self):
+        #Pooled Quiver connections, one per worker, with timeouts and retries
+        from quiver_client import QuiverClient
+        return QuiverClient(
+            {'Accept': "application/json", 'Authorization': os.getenv("QUIVER_API_KEY", "XXXXX")},
+            pool_size=int(os.getenv("LLM_INSIDER_CONCURRENCY", "4")),
+            timeout=float(os.getenv("QUIVER_TIMEOUT", "15")),
+            max_retries=int(os.getenv("QUIVER_MAX_RETRIES", "4")),
+            instrumentation=self.instrumentation)
+
+    @cached_property
+    def quiver_cache(self):
+        #Local cache for the Quiver responses, QUIVER_OFFLINE=1 runs only from the cache and the fixtures
+        from quiver_cache import QuiverCache
+        return QuiverCache(
+            db_path=os.getenv("QUIVER_CACHE_PATH", "quiver_cache.sqlite"),
+            fixtures_dir=os.getenv("QUIVER_FIXTURES_DIR"),
+            offline=os.getenv("QUIVER_OFFLINE") == "1" or self.replay)
+
+    def quiver_get(self, path):
+        return self.quiver_cache.get_json(path, self.quiver_client.request)
+
+    @cached_property
+    def quiver_store(self):
+        #The per-ticker trade and contract endpoints are ingested incrementally
+        from quiver_store import QuiverStore
+        return QuiverStore(
+            db_path=os.getenv("QUIVER_STORE_PATH", "quiver_store.sqlite"),
+            fetch=self.quiver_client.request,
+            offline=os.getenv("QUIVER_OFFLINE") == "1" or self.replay,
+            fallback_get=self.quiver_get)
+
+    @cached_property
+    def universe_feeds(self):
+        return {name: index_by_ticker(self.quiver_get(path)) for name, path in UNIVERSE_FEEDS.items()}
+
+    def volatility(self, symbols):
+        """Daily volatility of the symbols from the daily bars, every symbol is fetched once per process"""
+        with self.lock:
+            missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.volatilities]
+        if missing and self.replay:
+            recorded = self.run_record["volatility"]
+            with self.lock:
+                for symbol in missing:
+                    self.volatilities[symbol] = recorded.get(symbol, float("nan"))
+        elif missing:
+            with self.instrumentation.span("volatility", symbols=len(missing)):
+                fetched = fetch_daily_volatility(self.data_client, missing, days=int(os.getenv("SIZING_VOLATILITY_DAYS", "20")))
+            with self.lock:
+                for symbol in missing:
+                    self.volatilities[symbol] = fetched.get(symbol, float("nan"))
+            self.save_run_record()
+        return self.volatilities
+
+    def market_snapshot(self, symbols):
+        """Latest trades and quotes, symbols that are already in the snapshot are not fetched again"""
+        with self.lock:
+            missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.snapshot]
+        if not missing:
+            return self.snapshot
+        if self.replay:
+            recorded = self.run_record["snapshot"]
+            with self.lock:
+                self.snapshot.update({symbol: recorded[symbol] for symbol in missing if symbol in recorded})
+            return self.snapshot
+        with self.instrumentation.span("snapshot", symbols=len(missing)):
+            fetched = fetch_market_snapshot(self.data_client, missing)
+        with self.lock:
+            self.snapshot.update(fetched)
+        self.save_run_record()
+        return self.snapshot
+
+
+class InsiderStrategy:
+    """Trades on the insider, congress and government contract data of Quiver"""
+    name = "insider"
+    account = "insider"
+    model = "gpt-4.1"
+
+    def __init__(self, json_output=None, token_budget=None, concurrency=None):
+        #LLM_JSON_OUTPUT=1 lets the model answer with a JSON object instead of the text format
+        self.json_output = os.getenv("LLM_JSON_OUTPUT") == "1" if json_output is None else json_output
+        #Maximum number of tokens of the supplemental JSON data per symbol
+        self.token_budget = token_budget or int(os.getenv("LLM_INSIDER_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET)))
+        #Number of symbols that are analysed at the same time
+        self.concurrency = concurrency or int(os.getenv("LLM_INSIDER_CONCURRENCY", "4"))
+        self.chat_prompt = build_insider_prompt(json_output=self.json_output)
+
+    def model_kwargs(self):
+        return {"response_format": {"type": "json_object"}} if self.json_output else {}
+
+    def setup(self, context):
+        context.universe_feeds
+        context.quiver_store
+
+    def prepare(self, context, symbol, as_of, price):
+        #Insider, congress, senate, house and gov contract data of the last two months,
+        #the political beta is served from the feed that was prefetched once per process
+        with context.instrumentation.span("quiver"):
+            all_data = collect_insider_data(context.quiver_get, symbol, as_of,
+                                            context.universe_feeds["politicalbeta"].get(symbol, []), store=context.quiver_store)
+
+        #Only the relevant fields, summaries and the most informative rows are passed to the model
+        with context.instrumentation.span("compact"):
+            raw_json = json.dumps(all_data)
+            compact_json = dumps(compact_insider_data(all_data, token_budget=self.token_budget))
+        print(f"Supplemental data for {symbol}: {estimate_tokens(raw_json)} -> {estimate_tokens(compact_json)} tokens \n")
+
+        return self.chat_prompt.format_messages(input_stock=symbol, json_data=compact_json, current_stock_price=price)
+
+
+class WebStrategy:
+    """Trades on a web search of the news of the day"""
+    name = "web"
+    account = "web"
+    model = "gpt-4o-search-preview"
+
+    def __init__(self, concurrency=1):
+        self.concurrency = concurrency
+        self.chat_prompt = build_web_prompt()
+
+    def model_kwargs(self):
+        return {}
+
+    def setup(self, context):
+        pass
+
+    def prepare(self, context, symbol, as_of, price):
+        #Only the date goes into the prompt, so the prompt of a day can be rebuilt and replayed
+        return self.chat_prompt.format_messages(input_stock=symbol, today=as_of.strftime("%Y-%m-%d"), current_stock_price=price)
+
+
+STRATEGIES = {"insider": InsiderStrategy, "web": WebStrategy}
+
+
+class StrategyRun:
+    """One run of a strategy on a list of symbols within a shared context
+
+    The prompt, the model call and the parsing happen once per symbol, the
+    order is then fanned out to every account of the run, each with its own
+    sizing and limits. A symbol is skipped only if no account can take it.
+    The intended orders are collected and go through the order pipeline
+    together at the end of the run (in stream mode per trigger).
+    """
+
+    def __init__(self, strategy, symbols, context, accounts=None, as_of=None):
+        self.strategy = strategy
+        self.symbols = list(dict.fromkeys(symbols)) #Duplicates in the list are removed
+        self.context = context
+        self.accounts = [context.account(name) for name in accounts or [strategy.account]]
+        if context.data_account_name is None:
+            context.data_account_name = self.accounts[0].name
+        self.as_of = as_of or context.as_of
+
+    @cached_property
+    def chat_model(self):
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=self.strategy.model, openai_api_key=self.accounts[0].openai_key,
+                          model_kwargs=self.strategy.model_kwargs())
+
+    def open_accounts(self, symbol):
+        """Accounts without a position or an open order in the symbol"""
+        accounts = []
+        for account in self.accounts:
+            if account.has_position(symbol):
+                print(f"Position {symbol} already exists for this symbol on {account.name}. \n")
+            elif account.has_open_order(symbol):
+                print(f"Order {symbol} already made for this symbol on {account.name}. \n")
+            else:
+                accounts.append(account)
+        return accounts
+
+    def prepare_symbol(self, symbol):
+        """Collects the data of one symbol and returns the prompt, None if the symbol is skipped"""
+        if not self.open_accounts(symbol):
+            return None
+        snapshot = self.context.snapshot
+        if symbol not in snapshot:
+            print(f"No latest trade found for {symbol}. \n")
+            return None
+        return self.strategy.prepare(self.context, symbol, self.as_of, snapshot[symbol]["price"])
+
+    def handle_result(self, symbol, content):
+        #Printing result of model
+        print(content)
+
+        #All fields of the answer are parsed in one pass
+        instruction = parse_instruction(content)
+        if not instruction.is_valid:
+            print(f"Price extraction failed for {symbol}: {', '.join(instruction.errors)} \n")
+            return None
+
+        #One intended order per account that can take the symbol
+        price = self.context.snapshot.get(symbol, {}).get("price")
+        intents = []
+        for account in self.open_accounts(symbol):
+            if account.accepts(symbol, instruction.side):
+                intents.append(OrderIntent(
+                    account=account.name, symbol=symbol, side=instruction.side, qty=None, price=price,
+                    take_profit=instruction.take_profit, stop_loss=instruction.stop_loss,
+                    strategy=self.strategy.name, as_of=self.as_of.strftime("%Y-%m-%d")))
+        return intents
+
+    def submit(self, intents):
+        """Sizes the collected intents per account, then validates and places them"""
+        instrumentation = self.context.instrumentation
+        accounts = {account.name: account for account in self.accounts}
+        #max_orders is applied to the collected intents, nothing is placed before this point
+        kept = []
+        for name, account in accounts.items():
+            account_intents = account.within_max_orders([intent for intent in intents if intent.account == name])
+            with instrumentation.span("size", account=name):
+                account.size(account_intents, self.context)
+            kept.extend(account_intents)
+        with instrumentation.span("submit", orders=len(kept)):
+            return self.context.order_pipeline.submit(kept, accounts)
+
+    def process_and_submit(self, symbol):
+        return self.submit(self.process_symbol(symbol) or [])
+
+    def process_symbol(self, symbol):
+        instrumentation = self.context.instrumentation
+        with instrumentation.span("symbol", symbol, strategy=self.strategy.name):
+            with instrumentation.span("prepare"):
+                messages = self.prepare_symbol(symbol)
+            if messages is None:
+                return None
+            #Saving the output of the model
+            with instrumentation.span("llm", model=self.strategy.model):
+                content = self.context.llm_cache.invoke(self.chat_model, messages)
+            with instrumentation.span("parse"):
+                return self.handle_result(symbol, content)
+
+    def run_concurrently(self, function, symbols):
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.strategy.concurrency) as executor:
+            futures = {executor.submit(function, symbol): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"Processing {futures[future]} failed: {e} \n")
+        return results
+
+    def run_batch(self):
+        #All prompts are sent as one OpenAI batch, the orders are placed once the batch is completed
+        instrumentation = self.context.instrumentation
+        prompts = {symbol: messages for symbol, messages in self.run_concurrently(self.prepare_batch_symbol, self.symbols).items()
+                   if messages is not None}
+        with instrumentation.span("batch", prompts=len(prompts)):
+            contents = run_batch(
+                OpenAIBatchBackend(self.accounts[0].openai_key), prompts,
+                model=self.chat_model.model_name, temperature=self.chat_model.temperature,
+                poll_interval=float(os.getenv("LLM_BATCH_POLL_SECONDS", "60")),
+                cache=self.context.llm_cache,
+                model_kwargs=self.chat_model.model_kwargs,
+                instrumentation=instrumentation)
+        intents = []
+        for symbol, content in contents.items():
+            if content is None:
+                print(f"Batch request for {symbol} failed. \n")
+                continue
+            with instrumentation.span("parse", symbol):
+                intents.extend(self.handle_result(symbol, content) or [])
+        return self.submit(intents)
+
+    def prepare_batch_symbol(self, symbol):
+        with self.context.instrumentation.span("prepare", symbol, strategy=self.strategy.name):
+            return self.prepare_symbol(symbol)
+
+    def run_stream(self):
+        """Analyses a symbol only when its bars or a new insider filing trigger it
+
+        LLM_STREAM_REPLAY=<file> feeds recorded bars (JSON lines) instead of the live stream.
+        """
+        from market_triggers import FilingWatcher, TriggerEngine, read_recorded_bars
+        executor = ThreadPoolExecutor(max_workers=self.strategy.concurrency)
+
+        def report_failure(symbol, future):
+            if future.exception() is not None:
+                print(f"Processing {symbol} failed: {future.exception()} \n")
+
+        def on_trigger(symbol, reason, window):
+            print(f"Trigger for {symbol}: {reason} \n")
+            if window is not None and window.count:
+                self.context.snapshot.setdefault(symbol, {})["price"] = window.last_close
+            future = executor.submit(self.process_and_submit, symbol)
+            future.add_done_callback(lambda future, symbol=symbol: report_failure(symbol, future))
+
+        engine = TriggerEngine(
+            self.symbols, on_trigger,
+            window=int(os.getenv("LLM_STREAM_WINDOW", "60")),
+            volume_spike=float(os.getenv("LLM_STREAM_VOLUME_SPIKE", "3")),
+            move_sigma=float(os.getenv("LLM_STREAM_MOVE_SIGMA", "3")),
+            min_bars=int(os.getenv("LLM_STREAM_MIN_BARS", "20")),
+            cooldown=timedelta(minutes=float(os.getenv("LLM_STREAM_COOLDOWN_MINUTES", "30"))))
+
+        replay_path = os.getenv("LLM_STREAM_REPLAY")
+        if replay_path:
+            print(f"{engine.replay(read_recorded_bars(replay_path))} triggers in {replay_path} \n")
+        else:
+            FilingWatcher(self.context.quiver_get, self.symbols, engine.on_filing).start(
+                interval=float(os.getenv("LLM_STREAM_FILING_POLL_SECONDS", "900")))
+            self.context.live_stream.subscribe_bars(engine.on_bar, *self.symbols)
+            self.context.live_stream.run()
+        executor.shutdown(wait=True)
+
+    def run(self, mode="realtime"):
+        instrumentation = self.context.instrumentation
+        with instrumentation.span("run", strategy=self.strategy.name, mode=mode, accounts=[account.name for account in self.accounts]):
+            with instrumentation.span("setup"):
+                for account in self.accounts:
+                    account.account_state
+                self.strategy.setup(self.context)
+            self.context.market_snapshot(self.symbols)
+            self.context.save_run_record()
+            if mode == "stream":
+                self.run_stream()
+            elif mode == "batch":
+                self.run_batch()
+            else:
+                #Every symbol pipeline runs in its own worker, the orders are placed together
+                results = self.run_concurrently(self.process_symbol, self.symbols)
+                self.submit([intent for symbol in self.symbols for intent in results.get(symbol) or []])
+
+
+def run_mode():
+    if os.getenv("LLM_RUN_MODE"):
+        return os.getenv("LLM_RUN_MODE")
+    return "batch" if os.getenv("LLM_BATCH_MODE") == "1" else "realtime"
+
+
+def run(strategy, symbols, context=None, mode=None, accounts=None):
+    """Runs one strategy on the symbols, pass the same context to share clients, caches and the snapshot
+
+    With accounts (names of the context) the decisions are fanned out to all of them.
+    The summary of the run is printed if the context is created here, a
+    caller that passes its own context calls context.report() when it is done.
+    """
+    created = context is None
+    context = context or Context()
+    StrategyRun(strategy, symbols, context, accounts).run(mode or run_mode())
+    if created:
+        context.report()
+    return context
+
+
+def run_all(strategies, context=None, mode=None):
+    """Runs (strategy, symbols) pairs one after another in one shared context
+
+    The market data of all symbols is fetched in one snapshot up front.
+    """
+    created = context is None
+    context = context or Context()
+    runs = [StrategyRun(strategy, symbols, context) for strategy, symbols in strategies]
+    context.market_snapshot([symbol for strategy_run in runs for symbol in strategy_run.symbols])
+    for strategy_run in runs:
+        strategy_run.run(mode or run_mode())
+    if created:
+        context.report()
+    return context
+
+
+def variant_key(config):
+    return config.get("strategy", "insider"), json.dumps(config.get("variant", {}), sort_keys=True)
+
+
+def run_fanout(account_configs, symbols, context=None, mode=None):
+    """Runs every enabled account of the config, accounts with the same strategy variant share one run
+
+    A variant is the strategy plus its options ("variant" in the config,
+    e.g. {"json_output": true}). The Quiver data, prices and model answers
+    are computed once per variant and symbol, the cost grows with the number
+    of distinct prompts and not with the number of accounts.
+    """
+    created = context is None
+    context = context or Context(account_configs)
+    groups = {}
+    for name, config in account_configs.items():
+        if config.get("enabled", True):
+            groups.setdefault(variant_key(config), []).append(name)
+
+    if (mode or run_mode()) == "stream" and len(groups) > 1:
+        raise ValueError("The stream mode blocks on one live stream, run one strategy variant per process")
+
+    #One timestamp for all variants, identical prompts are answered once from the LLM cache,
+    #the runs are created first, so the snapshot uses the keys of the first run
+    as_of = context.as_of
+    runs = [(strategy_name, variant, names,
+             StrategyRun(STRATEGIES[strategy_name](**json.loads(variant)), symbols, context, names, as_of=as_of))
+            for (strategy_name, variant), names in groups.items()]
+    context.market_snapshot(symbols)
+    for strategy_name, variant, names, strategy_run in runs:
+        print(f"Running {strategy_name} {variant} for {', '.join(names)} \n")
+        strategy_run.run(mode or run_mode())
+    if created:
+        context.report()
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs one or more trading strategies in one process")
+    parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES), help="repeat to run several strategies")
+    parser.add_argument("--symbols", default=",".join(DEFAULT_SYMBOLS))
+    parser.add_argument("--mode", choices=["realtime", "batch", "stream"], default=None)
+    parser.add_argument("--accounts", default=os.getenv("STRATEGY_ACCOUNTS_CONFIG"),
+                        help="accounts config, runs every enabled account with its strategy variant")
+    args = parser.parse_args()
+
+    symbols = [symbol.strip() for symbol in args.symbols.split(",") if symbol.strip()]
+    if args.accounts:
+        run_fanout(load_accounts(args.accounts), symbols, mode=args.mode)
+        return
+    run_all([(STRATEGIES[name](), symbols) for name in args.strategy or ["insider", "web"]], mode=args.mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from alpaca.trading.requests import GetPortfolioHistoryRequest
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from pathlib import Path
+import pandas as pd
+import yfinance as yf
+import re
+
+
+def fetch_portfolio_history(client, start, end):
+    """Holt die tägliche Equity eines Alpaca-Kontos im Zeitraum"""
+    params = GetPortfolioHistoryRequest(
+        start_date=start.to_pydatetime(),
+        end_date=end.to_pydatetime(),
+        timeframe="1D"
+    )
+    history = client.get_portfolio_history(params)
+    return pd.DataFrame({
+        'equity': history.equity,
+        'timestamp': pd.to_datetime(history.timestamp, unit='s')
+    }).set_index('timestamp')
+
+
+#Spalten, die wie bei yf.download gespeichert werden
+BENCHMARK_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def fetch_benchmark(ticker, start, end):
+    """Holt Tageskurse von Yahoo Finance, end ist inklusive
+
+    yf.download teilt seine Ergebnisse über globale Variablen und darf nicht
+    aus mehreren Threads aufgerufen werden, Ticker.history schon.
+    """
+    data = yf.Ticker(ticker).history(start=start.strftime("%Y-%m-%d"), end=(end + timedelta(days=1)).strftime("%Y-%m-%d"))
+    data = data[[column for column in BENCHMARK_COLUMNS if column in data.columns]]
+    data.index = pd.to_datetime(data.index).tz_localize(None)
+    data.index.name = "Date"
+    return data
+
+
+class TimeSeriesStore:
+    """Lokaler Parquet-Speicher für Equity-Kurven und Benchmark-Kurse
+
+    Es werden nur die Tage nachgeladen, die noch nicht gespeichert sind. Der
+    letzte gespeicherte Tag wird neu geholt, wenn er heute ist oder danach
+    noch Tage fehlen, weil er unvollständig sein kann. Schlägt ein Abruf fehl,
+    werden die gespeicherten Daten verwendet. Mit offline=True wird nur aus
+    dem Speicher gelesen.
+    """
+
+    def __init__(self, root="data_store", offline=False):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.offline = offline
+
+    def path(self, kind, name):
+        return self.root / f"{kind}_{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')}.parquet"
+
+    def missing_ranges(self, stored, start, end):
+        if stored is None or stored.empty:
+            return [(start, end)]
+        ranges = []
+        first, last = stored.index.min().normalize(), stored.index.max().normalize()
+        if start < first:
+            ranges.append((start, first))
+        #Vergangene, vollständige Tage werden nicht erneut geholt
+        if end.normalize() > last or (end >= last and last >= pd.Timestamp.now().normalize()):
+            ranges.append((last, end))
+        return ranges
+
+    def load(self, kind, name, fetch, start, end):
+        path = self.path(kind, name)
+        stored = pd.read_parquet(path) if path.exists() else None
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end if end is not None else datetime.now())
+
+        if not self.offline:
+            changed = False
+            for fetch_start, fetch_end in self.missing_ranges(stored, start, end):
+                try:
+                    new = fetch(fetch_start, fetch_end)
+                except Exception as e:
+                    if stored is None:
+                        raise
+                    print(f"Abruf von {name} fehlgeschlagen: {e}, gespeicherte Daten werden verwendet")
+                    continue
+                if new.empty:
+                    continue
+                combined = new if stored is None else pd.concat([stored, new])
+                stored = combined[~combined.index.duplicated(keep="last")].sort_index()
+                changed = True
+            if changed:
+                stored.to_parquet(path)
+
+        if stored is None:
+            raise LookupError(f"Keine gespeicherten Daten für {name} in {self.root}")
+        if end == end.normalize():
+            end = end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1) # Datum ohne Uhrzeit: ganzer Tag
+        return stored[(stored.index >= start) & (stored.index <= end)].copy()
+
+    def equity(self, name, client, start, end=None):
+        """Equity-Kurve des Kontos name, Spalte 'equity' mit Zeitstempel als Index"""
+        return self.load("equity", name, lambda s, e: fetch_portfolio_history(client, s, e), start, end)
+
+    def benchmark(self, ticker, start, end=None):
+        """Tageskurse des Tickers wie von yf.download"""
+        return self.load("benchmark", ticker, lambda s, e: fetch_benchmark(ticker, s, e), start, end)
+
+
+def fetch_parallel(jobs, timeout=60, max_workers=None):
+    """Führt die Abrufe jobs (name -> Funktion) gleichzeitig aus
+
+    Gibt (Ergebnisse, Fehler) zurück. Ein fehlgeschlagener oder zu langsamer
+    Abruf bricht den Bericht nicht ab, er wird nur gemeldet.
+    """
+    results, errors = {}, {}
+    executor = ThreadPoolExecutor(max_workers=max_workers or max(1, len(jobs)))
+    futures = {executor.submit(job): name for name, job in jobs.items()}
+    done, not_done = wait(futures, timeout=timeout)
+    for future in done:
+        name = futures[future]
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+    for future in not_done:
+        errors[futures[future]] = TimeoutError(f"nach {timeout}s abgebrochen")
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for name, error in errors.items():
+        print(f"Abruf von {name} fehlgeschlagen: {error}")
+    return results, errors
@@ -0,0 +1,208 @@
+from alpaca.trading.client import TradingClient
+from alpaca.trading.stream import TradingStream
+from dotenv import load_dotenv
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import os
+import threading
+
+from account_state import AccountState, status_value
+
+#Events that are written to the fill log
+LOGGED_EVENTS = {"fill", "partial_fill", "rejected", "canceled", "expired", "done_for_day", "replaced"}
+
+#Default fill log, {account} is replaced by the name of the account
+FILL_LOG_PATH = "fills_{account}.jsonl"
+
+
+def to_float(value):
+    return None if value is None else float(value)
+
+
+class FillLog:
+    """Append-only JSON lines file with one trade event per line
+
+    Every line is flushed at once, so a crash loses at most the event that
+    was being written.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+FILL_LOGS = {}
+FILL_LOGS_LOCK = threading.Lock()
+
+
+def shared_fill_log(path):
+    """One FillLog per file, accounts that log into the same file share its writer"""
+    path = Path(path).resolve()
+    with FILL_LOGS_LOCK:
+        if path not in FILL_LOGS:
+            FILL_LOGS[path] = FillLog(path)
+        return FILL_LOGS[path]
+
+
+def fill_log_path(account, path=None):
+    return (path or os.getenv("FILL_LOG_PATH") or FILL_LOG_PATH).format(account=account)
+
+
+def read_fill_log(path):
+    """Yields the records of a fill log, a cut off last line is skipped"""
+    path = Path(path)
+    if not path.exists():
+        return
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class TradeListener:
+    """Keeps an order book of one account up to date from the trade updates stream
+
+    Orders are stored by id, the legs of bracket orders point to their parent
+    order. Positions and open orders are kept in the AccountState, so the
+    scripts see fills without polling. Fills, rejections and cancellations
+    are appended to the fill log with the name of the account, so several
+    accounts can share one log.
+    """
+
+    def __init__(self, account_state, fill_log=None, verbose=True, account=None):
+        self.account_state = account_state
+        self.account = account
+        self.fill_log = fill_log
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.orders = {}
+        self.parents = {}
+        self.stream = None
+        for orders in account_state.open_orders.values():
+            for order in orders.values():
+                self.track(order)
+
+    def track(self, order):
+        """Adds an order and its bracket legs to the order book"""
+        with self.lock:
+            self.orders[str(order.id)] = order
+            for leg in getattr(order, "legs", None) or []:
+                self.orders[str(leg.id)] = leg
+                self.parents[str(leg.id)] = str(order.id)
+
+    def record(self, data):
+        """Log record of one trade update"""
+        order = data.order
+        order_id = str(order.id)
+        with self.lock:
+            parent_id = self.parents.get(order_id)
+        return {
+            "time": (data.timestamp or datetime.now(timezone.utc)).isoformat(),
+            "account": self.account,
+            "event": status_value(data.event),
+            "symbol": order.symbol,
+            "order_id": order_id,
+            "client_order_id": order.client_order_id,
+            "parent_order_id": parent_id,
+            "side": status_value(order.side),
+            "order_type": status_value(order.type),
+            "status": status_value(order.status),
+            "qty": to_float(data.qty),
+            "price": to_float(data.price),
+            "filled_qty": to_float(order.filled_qty),
+            "filled_avg_price": to_float(order.filled_avg_price),
+            "position_qty": to_float(data.position_qty),
+            "execution_id": str(data.execution_id) if data.execution_id else None,
+        }
+
+    def apply(self, data):
+        """Updates the order book and the account state from one trade update"""
+        event = status_value(data.event)
+        self.account_state.apply_trade_update(data)
+        self.track(data.order)
+        if event not in LOGGED_EVENTS:
+            return None
+        record = self.record(data)
+        if self.fill_log is not None:
+            self.fill_log.append(record)
+        if self.verbose:
+            leg = f" (leg of {record['parent_order_id']})" if record["parent_order_id"] else ""
+            print(f"{record['event']}: {record['side']} {record['symbol']} {record['qty'] or ''} @ {record['price'] or ''}{leg}")
+        return record
+
+    async def on_trade_update(self, data):
+        self.apply(data)
+
+    def order(self, order_id):
+        with self.lock:
+            return self.orders.get(str(order_id))
+
+    def legs(self, order_id):
+        """Bracket legs of an order"""
+        with self.lock:
+            return [self.orders[leg] for leg, parent in self.parents.items() if parent == str(order_id)]
+
+    def start(self, api_key, secret_key, paper=True):
+        """Runs the stream in a background thread next to the trading script"""
+        self.stream = TradingStream(api_key, secret_key, paper=paper)
+        self.stream.subscribe_trade_updates(self.on_trade_update)
+        threading.Thread(target=self.stream.run, daemon=True).start()
+
+    def run(self, api_key, secret_key, paper=True):
+        """Runs the stream in the current thread until it is stopped"""
+        self.stream = TradingStream(api_key, secret_key, paper=paper)
+        self.stream.subscribe_trade_updates(self.on_trade_update)
+        self.stream.run()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+
+
+def main():
+    from strategy_core import ACCOUNTS, load_accounts
+
+    parser = argparse.ArgumentParser(description="Listens to the trade updates of an account and logs its fills")
+    parser.add_argument("--account", default="insider")
+    parser.add_argument("--accounts", default=os.getenv("STRATEGY_ACCOUNTS_CONFIG", "accounts_config.json"),
+                        help="accounts config with the key names of the accounts")
+    parser.add_argument("--log", default=None, help="fill log, default fills_<account>.jsonl, {account} is replaced")
+    args = parser.parse_args()
+
+    accounts = dict(ACCOUNTS, **(load_accounts(args.accounts) if Path(args.accounts).exists() else {}))
+    if args.account not in accounts:
+        parser.error(f"unknown account {args.account}, known: {', '.join(sorted(accounts))}")
+    load_dotenv()
+    config = accounts[args.account]
+    api_key, secret_key = os.getenv(config["api_key_env"]), os.getenv(config["secret_key_env"])
+    account_state = AccountState(TradingClient(api_key, secret_key, paper=True))
+    fill_log = shared_fill_log(fill_log_path(args.account, args.log))
+    listener = TradeListener(account_state, fill_log, account=args.account)
+    print(f"Listening to trade updates of {args.account}, {len(listener.orders)} open orders")
+    try:
+        listener.run(api_key, secret_key, paper=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fill_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+from dataclasses import dataclass, field
+import json
+import math
+import re
+
+#All fields of the trade instruction format, found in one scan of the answer
+FIELD_PATTERN = re.compile(
+    r"(?P<label>stock name|buy/sell price|buy price|sell price|take profit|stop loss)[*_\s]*[:=]?[*_\s]*(?P<value>[^\n]*)",
+    re.IGNORECASE)
+
+#Markdown that may stand in front of a label at the start of a line
+LINE_PREFIX_PATTERN = re.compile(r"[\s*#>_-]*")
+
+#A price on the same line as its label: 1.234,56 / 1,234.56 / 1234.56 / 123,45
+PRICE_PATTERN = re.compile(r"(\$)?\s*(\d{1,3}(?:\.\d{3})+,\d+|\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:[.,]\d+)?)")
+
+#A number that is followed by a percent sign is not a price
+PERCENT_PATTERN = re.compile(r"\s*%")
+
+FIELD_NAMES = {
+    "stock name": "stock_name",
+    "buy/sell price": "entry_price",
+    "buy price": "entry_price",
+    "sell price": "entry_price",
+    "take profit": "take_profit",
+    "stop loss": "stop_loss",
+}
+
+#Output format for the JSON mode of the model
+JSON_OUTPUT_FORMAT = """Trade Instruction Output Format (strict):
+Answer only with a JSON object with the keys "stock_name", "entry_price", "take_profit", "stop_loss" and "explanation".
+All prices are numbers without currency symbols."""
+
+
+@dataclass
+class TradeInstruction:
+    stock_name: str = None
+    entry_price: float = None
+    take_profit: float = None
+    stop_loss: float = None
+    errors: list = field(default_factory=list)
+
+    @property
+    def side(self):
+        """buy if the target is above the stop, sell if it is below"""
+        if self.take_profit is None or self.stop_loss is None or self.take_profit == self.stop_loss:
+            return None
+        return "buy" if self.take_profit > self.stop_loss else "sell"
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+
+def parse_price(text):
+    """The first $ price of the text, otherwise its first number that is not a percentage"""
+    candidates = [match for match in PRICE_PATTERN.finditer(text) if not PERCENT_PATTERN.match(text, match.end())]
+    match = next((match for match in candidates if match.group(1)), candidates[0] if candidates else None)
+    if match is None:
+        return None
+    raw_price = match.group(2)
+    if "," in raw_price and "." in raw_price:
+        if raw_price.rfind(",") > raw_price.rfind("."):
+            raw_price = raw_price.replace(".", "").replace(",", ".")
+        else:
+            raw_price = raw_price.replace(",", "")
+    elif re.fullmatch(r"\d{1,3}(?:,\d{3})+", raw_price):
+        raw_price = raw_price.replace(",", "")
+    else:
+        raw_price = raw_price.replace(",", ".") #Dezimaltrennzeichen vereinheitlichen
+    return float(raw_price)
+
+
+def validate(instruction):
+    for name in ("take_profit", "stop_loss"):
+        value = getattr(instruction, name)
+        if value is None:
+            instruction.errors.append(f"{name} missing")
+        elif not math.isfinite(value):
+            instruction.errors.append(f"{name} is not a finite number")
+        elif value <= 0:
+            instruction.errors.append(f"{name} not positive")
+    if instruction.entry_price is not None and not math.isfinite(instruction.entry_price):
+        instruction.errors.append("entry_price is not a finite number")
+    elif instruction.entry_price is not None and instruction.entry_price <= 0:
+        instruction.errors.append("entry_price not positive")
+    if not instruction.errors and instruction.side is None:
+        instruction.errors.append("take_profit equals stop_loss")
+    return instruction
+
+
+def parse_text_instruction(text):
+    """Parses the "Stock name / Buy price / Take profit / Stop loss" format in one pass"""
+    values = {}
+    fallback = {}
+    for match in FIELD_PATTERN.finditer(text):
+        name = FIELD_NAMES[match.group("label").lower()]
+        #labels at the start of a line win over labels inside the explanation text
+        line_start = text.rfind("\n", 0, match.start()) + 1
+        target = values if LINE_PREFIX_PATTERN.fullmatch(text, line_start, match.start()) else fallback
+        if name in target:
+            continue #the first occurrence of every field counts
+        value = match.group("value").strip(" *_")
+        if name == "stock_name":
+            target[name] = value or None
+        else:
+            price = parse_price(value)
+            if price is not None:
+                target[name] = price
+    return validate(TradeInstruction(**{**fallback, **values}))
+
+
+def parse_json_instruction(text):
+    """Parses an answer of the JSON mode"""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        return TradeInstruction(errors=[f"invalid JSON: {e}"])
+    instruction = TradeInstruction(stock_name=data.get("stock_name"))
+    for name in ("entry_price", "take_profit", "stop_loss"):
+        value = data.get(name)
+        if value is None:
+            continue
+        try:
+            setattr(instruction, name, float(value))
+        except (TypeError, ValueError):
+            price = parse_price(str(value))
+            if price is None:
+                instruction.errors.append(f"{name} is not a number")
+            setattr(instruction, name, price)
+    return validate(instruction)
+
+
+def parse_instruction(text):
+    """Parses an answer of the model, JSON answers are detected automatically"""
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped.strip("`").removeprefix("json").strip()
+    if stripped.startswith("{"):
+        return parse_json_instruction(stripped)
+    return parse_text_instruction(text)